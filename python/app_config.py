@@ -6,9 +6,44 @@ CONFIG_PATH = Path("config.json")
 
 DEFAULT_CONFIG = {
     "camera_index": 2,           # あなたの元コード既定値
+    "camera_stall_timeout": 2.0, # この秒数フレームが来なければカメラを開き直す
+    "camera_backoff_max": 10.0,  # 開き直しの間隔の上限（秒。失敗するたびに倍）
     "swap_sec": 15.0,            # 二人モードの入れ替え秒
     "max_scale": 4.5,            # 表示上の最大倍率クランプ
-    "debug_overlay": 1           # 0/1
+    "debug_overlay": 1,          # 0/1
+    "idle_after_sec": 30.0,      # 顔がこの秒数いなければアイドル（推論を止めて差分だけ見る。0 で無効）
+    "idle_poll_hz": 5.0,         # アイドル中に差分を見る頻度
+    "idle_motion_thresh": 4.0,   # アイドルから戻る差分の閾値（64x36 グレーの平均差）
+    "audio_backend": "pygame",   # "pygame" or "null"（音を出さない。ヘッドレス/テスト用）
+    "audio_fade_sec": 0.25,      # 笑い声の層を切り替える時のクロスフェード（秒）
+    "target_fps": 0,             # 目標FPS（表示の FPS。推論＋描画・表示の1フレームの時間で見る）。下回ると推論解像度・検出間隔・モデルを段階的に軽くする（0 で無効）
+    "pipeline_mode": "threaded", # "threaded"（キャプチャ/推論/描画を分離） / "serial"（従来ループ） / "multiprocess"（モデルを別プロセスで）
+    "mp_ring_slots": 4,          # multiprocess: 共有メモリのフレームリングの枚数
+    "mp_result_timeout": 0.5,    # multiprocess: ワーカー結果の待ち上限（秒）。過ぎたら検出なし扱い
+    "detect_interval_min": 2,    # 顔検出/Pose を回す間隔の下限（フレーム）
+    "detect_interval_max": 10,   # 同 上限（顔が静止しているほど上限に近づく）
+    "hog_downscale": 0.5,        # HOG補完の縮小率
+    "hog_reuse_frames": 5,       # 動きが無ければ HOG 結果を再利用する回数
+    "sprite_size_step": 4,       # 鼻スプライトのサイズ量子化ステップ（px）
+    "sprite_cache_mb": 32,       # 鼻スプライトキャッシュの上限（MB）
+    "sprite_prewarm": 0,         # 1 で起動時に代表サイズを作っておく
+    "screen_width": 0,           # 表示解像度（0 なら実ディスプレイから検出）
+    "screen_height": 0,
+    "inference_width": 0,        # 検出に使う解像度（例 640x360。0 ならカメラのまま。片方だけなら縦横比を保つ）
+    "inference_height": 0,
+    "face_mesh_mode": "full",    # "full"（フレーム全体） or "roi"（トラックごとの切り抜きをタイルに並べて1回で）
+    "face_mesh_roi_tile": 256,   # roi: 1人分のタイルの大きさ（px）
+    "face_mesh_roi_pad": 0.5,    # roi: 顔ボックスの周りに足す余白（辺の長さに対する割合）
+    "nose_logic_engine": "dict", # "dict"（従来） or "vector"（配列版・大人数向け）
+    "nose_logic_reset": "changed", # 顔ぶれが変わった時に "changed"（出入りした人だけ）or "all"（従来どおり全員）を初期化
+    "tracker": "assignment",     # "assignment"（予測＋全体最適） or "greedy"（従来）
+    "reid_cache_size": 32,       # 見失った人の状態を預かる人数（0 で使わない）
+    "reid_ttl_sec": 60.0,        # 預かる時間の上限（秒）
+    "reid_max_dist": 0.35,       # 同じ人とみなす特徴の距離（小さいほど厳しい）
+    "metrics_enabled": 1,        # ステージごとの処理時間を計測（0 でほぼゼロコスト）
+    "metrics_export_path": "",   # 例 "metrics.csv" / "metrics.jsonl"（空なら書き出さない）
+    "metrics_export_interval": 10.0,
+    "startup_report_path": ""    # 起動内訳を JSONL で追記するパス（空なら表示のみ）
 }
 
 def load_config() -> dict:
@@ -20,5 +55,14 @@ def load_config() -> dict:
             return dict(DEFAULT_CONFIG)
     return dict(DEFAULT_CONFIG)
 
+def load_saved_config() -> dict:
+    """config.json に書かれている項目だけ（既定値は混ぜない）。無い・読めない時は空。"""
+    if CONFIG_PATH.exists():
+        try:
+            return dict(json.loads(CONFIG_PATH.read_text(encoding="utf-8")) or {})
+        except Exception:
+            return {}
+    return {}
+
 def save_config(cfg: dict):
     CONFIG_PATH.write_text(json.dumps(cfg, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -0,0 +1,150 @@
+# audio.py — 笑い声の再生（別スレッド。鳴らす層だけ再生し、音量はクロスフェードで変える）
+import threading
+import time
+from collections import deque
+
+# 層の名前 -> ファイル
+LAYERS = {
+    "big":     "assets/laugh_big.wav",
+    "giggle":  "assets/laugh_giggle.wav",
+    "chuckle": "assets/laugh_chuckle.wav",
+}
+
+
+def layer_for_smile(smile):
+    """笑顔スコア（平均）から鳴らす層。顔がいなければ None（無音）。"""
+    if smile is None:   return None
+    if smile < 0.1:     return "big"
+    if smile < 0.25:    return "giggle"
+    return "chuckle"
+
+
+class NullBackend:
+    """音を出さないバックエンド（ヘッドレス・テスト用）。呼ばれた操作を直近 log_size 件だけ log に残す。"""
+    def __init__(self, layers=LAYERS, log_size=1000):
+        self.layers = tuple(layers)
+        self.log    = deque(maxlen=log_size)   # 長時間動かしても増え続けない
+
+    def play(self, layer):            self.log.append(("play", layer))
+    def stop(self, layer):            self.log.append(("stop", layer))
+    def set_gain(self, layer, gain):  self.log.append(("gain", layer, round(gain, 3)))
+    def pause(self):                  self.log.append(("pause",))
+    def resume(self):                 self.log.append(("resume",))
+    def close(self):                  pass
+
+
+class PygameBackend:
+    """pygame.mixer で鳴らす。層ごとに Sound を持ち、再生中だけチャンネルを使う。"""
+    def __init__(self, layers=LAYERS):
+        import pygame
+        pygame.mixer.init()
+        pygame.display.set_mode((1, 1), pygame.NOFRAME)
+        self._mixer   = pygame.mixer
+        self._sounds  = {name: pygame.mixer.Sound(path) for name, path in layers.items()}
+        self._chans   = {}
+        self.layers   = tuple(layers)
+
+    def play(self, layer):
+        ch = self._sounds[layer].play(loops=-1)
+        if ch is not None:
+            ch.set_volume(0.0)
+            self._chans[layer] = ch
+
+    def stop(self, layer):
+        ch = self._chans.pop(layer, None)
+        if ch is not None:
+            ch.stop()
+
+    def set_gain(self, layer, gain):
+        ch = self._chans.get(layer)
+        if ch is not None:
+            ch.set_volume(gain)
+
+    def pause(self):  self._mixer.pause()
+    def resume(self): self._mixer.unpause()
+
+    def close(self):
+        self._mixer.stop()
+
+
+class AudioEngine(threading.Thread):
+    """
+    set_smile(score or None) / set_paused(bool) を描画スレッドから呼ぶだけ（最新値を置くだけで待たない）。
+    このスレッドが:
+      - 目標の層が変わった時だけ fade 秒かけてクロスフェード（tick_hz で音量を更新）。
+      - 音量が 0 になった層は止める（鳴らしていない層はデコードしない）。
+      - 目標が変わらない間は何もしない（set_volume を毎フレーム呼ばない）。
+    """
+    def __init__(self, backend, fade=0.25, tick_hz=50.0):
+        super().__init__(name="audio", daemon=True)
+        self.backend  = backend
+        self.fade     = float(fade)
+        self.tick     = 1.0 / float(tick_hz)
+        self._smile   = None        # 描画スレッドが置く最新値（代入だけなのでロック不要）
+        self._paused  = False
+        self._wake    = threading.Event()
+        self._stop_ev = threading.Event()
+        self._gain    = {name: 0.0 for name in backend.layers}
+        self._playing = set()
+        self._target  = None
+        self._is_paused = False
+
+    # ---- 描画スレッドから ----
+    def set_smile(self, smile):
+        layer = layer_for_smile(smile)
+        if layer != self._smile:
+            self._smile = layer
+            self._wake.set()
+
+    def set_paused(self, paused):
+        if paused != self._paused:
+            self._paused = paused
+            self._wake.set()
+
+    def stop(self):
+        self._stop_ev.set()
+        self._wake.set()
+        self.join(timeout=1.0)
+        self.backend.close()
+
+    # ---- このスレッド ----
+    def _step(self, dt):
+        """1ティック分だけ音量を目標に近づける。まだフェード中なら True。"""
+        rate = dt / self.fade if self.fade > 0 else 1.0
+        fading = False
+        for name, g in self._gain.items():
+            goal = 1.0 if name == self._target else 0.0
+            if g == goal:
+                continue
+            if goal > 0 and name not in self._playing:
+                self.backend.play(name)
+                self._playing.add(name)
+            g = min(goal, g + rate) if goal > g else max(goal, g - rate)
+            self._gain[name] = g
+            self.backend.set_gain(name, g)
+            if goal == 0.0 and g == 0.0 and name in self._playing:
+                self.backend.stop(name)
+                self._playing.discard(name)
+            fading |= g != goal
+        return fading
+
+    def run(self):
+        fading = False
+        last = time.monotonic()
+        while not self._stop_ev.is_set():
+            # フェード中だけ tick で回り、それ以外は次の変化まで眠る
+            self._wake.wait(self.tick if fading else None)
+            self._wake.clear()
+            now = time.monotonic()
+            dt, last = now - last, now
+
+            if self._paused != self._is_paused:
+                self._is_paused = self._paused
+                (self.backend.pause if self._is_paused else self.backend.resume)()
+            if self._is_paused:
+                fading = False
+                continue
+            if self._smile != self._target:
+                self._target = self._smile
+                dt = 0.0   # フェードはここから数える
+            fading = self._step(dt)
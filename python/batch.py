@@ -0,0 +1,198 @@
+# batch.py — 録画のディレクトリをプロセスプールで並列に処理し、ファイルごとに列形式の .npz を出す
+#   python batch.py sessions/ -o results/
+#   python batch.py sessions/ -o results/ --jobs 8 --annotate
+#   python batch.py sessions/ -o results/ --stride 2       （1フレームおきに処理。時刻はそのまま）
+# 1ワーカー = 1ファイルずつ。モデルはワーカーごとに1回だけ作り、ファイルが変わる時は状態だけ初期化する。
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from glob import glob
+
+import cv2
+import numpy as np
+
+from app_config import load_config
+from frame_processor import FrameProcessor, TRACK_DTYPE, track_table
+
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv", ".m4v")
+
+_processor = None   # ワーカープロセスごとの FrameProcessor
+
+
+def _init_worker(cfg, n_images):
+    global _processor
+    cv2.setNumThreads(1)   # 並列はプロセスで取るので OpenCV 内のスレッドは使わない
+    _processor = FrameProcessor(cfg, n_images=n_images)
+    _processor.debug_overlay = False
+
+
+def session_arrays(ts, assigned, tables):
+    """
+    フレームごとの結果を列ごとの配列にまとめる（.npz の中身）。
+      ts, assigned_id: (frames,)    assigned_id は居なければ -1
+      offsets:         (frames+1,)  フレーム i の行は offsets[i]:offsets[i+1]
+      id, cx, cy, nose_x, nose_y, base_size, smile, scale: (rows,)  1行 = 1フレームの1人
+    """
+    rows = np.concatenate(tables) if tables else np.empty(0, dtype=TRACK_DTYPE)
+    offsets = np.zeros(len(tables) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in tables], out=offsets[1:])
+    out = {"ts": np.asarray(ts, dtype=np.float64),
+           "assigned_id": np.asarray(assigned, dtype=np.int32),
+           "offsets": offsets}
+    out.update({name: rows[name] for name in TRACK_DTYPE.names})
+    return out
+
+
+def annotate(frame, res, table):
+    """確認用の描画（トラック中心・鼻の大きさの円・ID/笑顔/倍率）。"""
+    for r in table:
+        color = (0, 0, 255) if r["id"] == res["assigned_id"] else (0, 255, 0)
+        cx, cy = int(r["cx"]), int(r["cy"])
+        cv2.circle(frame, (cx, cy), 4, color, -1)
+        text = f"ID {r['id']}"
+        if not np.isnan(r["nose_x"]):
+            radius = max(4, int(r["base_size"] * r["scale"] / 2))
+            cv2.circle(frame, (int(r["nose_x"]), int(r["nose_y"])), radius, color, 2)
+            text += f" s={r['smile']:.2f} sc={r['scale']:.2f}"
+        cv2.putText(frame, text, (cx + 8, cy - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    return frame
+
+
+def process_file(path, out_dir, stride=1, annotate_video=False, seed=0, processor=None):
+    """
+    1ファイルを処理して <out_dir>/<名前>.npz（と --annotate なら .mp4）を書く。
+    return: {"file", "frames", "sec", "cpu_sec", "fps", "out"}（失敗時は "error"）
+    """
+    proc = processor or _processor
+    proc.reset(seed)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    out_path = os.path.join(out_dir, stem + ".npz")
+    ts_list, assigned, tables = [], [], []
+    writer = None
+    src_fps = 0.0
+    t0, c0 = time.perf_counter(), time.process_time()
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise IOError(f"動画を開けませんでした: {path}")
+        src_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        i = 0
+        while True:
+            # 飛ばすフレームは grab だけ（画像に展開しない）
+            if i % stride:
+                if not cap.grab():
+                    break
+                i += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            ts = i / src_fps
+            i += 1
+            res = proc.process(frame, ts)
+            table = track_table(res)
+            ts_list.append(ts)
+            assigned.append(-1 if res["assigned_id"] is None else res["assigned_id"])
+            tables.append(table)
+            if annotate_video:
+                if writer is None:
+                    h, w = frame.shape[:2]
+                    writer = cv2.VideoWriter(os.path.join(out_dir, stem + "_annotated.mp4"),
+                                             cv2.VideoWriter_fourcc(*"mp4v"), src_fps / stride, (w, h))
+                writer.write(annotate(frame, res, table))
+    except Exception as e:
+        return {"file": path, "error": f"{type(e).__name__}: {e}"}
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+
+    arrays = session_arrays(ts_list, assigned, tables)
+    np.savez_compressed(out_path, source=np.array(path), source_fps=np.float64(src_fps),
+                        stride=np.int32(stride), **arrays)
+    sec, cpu = time.perf_counter() - t0, time.process_time() - c0
+    n = len(ts_list)
+    return {"file": path, "frames": n, "video_sec": n * stride / src_fps if src_fps else 0.0,
+            "sec": sec, "cpu_sec": cpu, "fps": n / sec if sec else 0.0, "out": out_path}
+
+
+def find_videos(path):
+    if os.path.isfile(path):
+        return [path]
+    return sorted(f for f in glob(os.path.join(path, "**", "*"), recursive=True)
+                  if f.lower().endswith(VIDEO_EXTS))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Nose Mirror offline batch processor")
+    ap.add_argument("input", help="動画のディレクトリ（サブディレクトリも探す）or 動画ファイル")
+    ap.add_argument("-o", "--out", default="batch_out", help="出力ディレクトリ")
+    ap.add_argument("--jobs", type=int, default=0, help="ワーカー数（0 で CPU コア数、1 でこのプロセスだけ）")
+    ap.add_argument("--stride", type=int, default=1, help="N フレームごとに1回処理する")
+    ap.add_argument("--annotate", action="store_true", help="確認用の描画入り動画も書く")
+    ap.add_argument("--seed", type=int, default=0, help="割当の乱数シード（全ファイル共通）")
+    args = ap.parse_args(argv)
+
+    files = find_videos(args.input)
+    if not files:
+        ap.error(f"動画が見つかりません: {args.input}")
+    os.makedirs(args.out, exist_ok=True)
+    cfg = load_config()
+    n_images = max(1, len(glob("assets/nose_*.png")))
+    jobs = max(1, min(args.jobs or os.cpu_count() or 1, len(files)))
+    task = dict(out_dir=args.out, stride=max(1, args.stride), annotate_video=args.annotate, seed=args.seed)
+
+    results = []
+    t0 = time.perf_counter()
+
+    def report(r):
+        results.append(r)
+        if "error" in r:
+            print(f"[{len(results)}/{len(files)}] {r['file']}: {r['error']}", file=sys.stderr)
+        else:
+            print(f"[{len(results)}/{len(files)}] {r['file']}: {r['frames']} frames "
+                  f"in {r['sec']:.1f}s ({r['fps']:.1f} fps)", file=sys.stderr)
+
+    if jobs == 1:
+        _init_worker(cfg, n_images)
+        for f in files:
+            report(process_file(f, **task))
+    else:
+        # FrameProcessor（中の MediaPipe のグラフも）はワーカーごとに1つ作り、ファイルをまたいで使い回す
+        with ProcessPoolExecutor(jobs, mp_context=mp.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(cfg, n_images)) as ex:
+            futures = [ex.submit(process_file, f, **task) for f in files]
+            for fut in as_completed(futures):
+                report(fut.result())
+
+    wall = time.perf_counter() - t0
+    ok = [r for r in results if "error" not in r]
+    frames = sum(r["frames"] for r in ok)
+    video_sec = sum(r["video_sec"] for r in ok)
+    summary = {
+        "files":         len(files),
+        "failed":        len(results) - len(ok),
+        "jobs":          jobs,
+        "frames":        frames,
+        "wall_sec":      round(wall, 2),
+        "fps":           round(frames / wall, 2) if wall else 0.0,
+        "fps_per_core":  round(frames / wall / jobs, 2) if wall else 0.0,
+        "video_sec":     round(video_sec, 1),
+        "realtime_x":    round(video_sec / wall, 2) if wall else 0.0,   # 録画の何倍速で処理できたか
+        "results":       sorted(results, key=lambda r: r["file"]),
+    }
+    with open(os.path.join(args.out, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"{frames} frames / {len(ok)} files in {wall:.1f}s: {summary['fps']:.1f} fps total, "
+          f"{summary['fps_per_core']:.1f} fps/core x {jobs}, {summary['realtime_x']:.2f}x realtime",
+          file=sys.stderr)
+    if summary["realtime_x"] > 0:
+        print(f"24h of footage ≈ {24 / summary['realtime_x']:.1f}h at this rate", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
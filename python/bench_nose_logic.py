@@ -0,0 +1,71 @@
+# bench_nose_logic.py — NoseLogic（dict版）と VectorNoseLogic（配列版）の一致確認と速度比較
+#   python bench_nose_logic.py   … 出力が完全一致することを確認し、人数ごとの1フレーム時間を表示
+import sys
+import time
+
+import numpy as np
+
+from nose_logic import NoseLogic, VectorNoseLogic
+
+class _Clock:
+    def __init__(self): self.t = 0.0
+    def __call__(self): return self.t
+
+def record_sequence(n_frames, max_people, seed):
+    """
+    (dt, {id: smile}) の列を作る。人は出入りし、笑顔は静止→笑う→戻る を繰り返す。
+    """
+    rng = np.random.default_rng(seed)
+    present = set()
+    phase = {}
+    seq = []
+    for i in range(n_frames):
+        if rng.random() < 0.02:
+            pid = int(rng.integers(0, max_people * 2))
+            if pid in present and len(present) > 0: present.discard(pid)
+            elif len(present) < max_people: present.add(pid); phase[pid] = rng.uniform(0, 6.28)
+        smiles = {}
+        for pid in sorted(present, key=lambda p: (p * 7919) % 97):
+            base = 0.1 + 0.05 * np.sin(i / 40.0 + phase[pid])
+            burst = 0.5 if (i // 90 + pid) % 3 == 0 else 0.0
+            smiles[pid] = float(np.clip(base + burst + rng.normal(0, 0.03), 0, 1))
+        seq.append((float(rng.uniform(1/60, 1/20)), smiles))
+    return seq
+
+def run(cls, seq, **kw):
+    clock = _Clock()
+    logic = cls(clock=clock, **kw)
+    out = []
+    for dt, smiles in seq:
+        clock.t += dt
+        out.append(logic.update({pid: None for pid in smiles}, smiles))
+    return out
+
+def check():
+    for legacy in (False, True):
+        for seed in range(5):
+            seq = record_sequence(3000, 6, seed)
+            a = run(NoseLogic, seq, legacy_reset=legacy)
+            b = run(VectorNoseLogic, seq, legacy_reset=legacy)
+            for i, (x, y) in enumerate(zip(a, b)):
+                if list(x.items()) != list(y.items()):
+                    print(f"NG legacy_reset={legacy} seed={seed} frame={i}: {x} != {y}")
+                    return False
+    print("OK: NoseLogic と VectorNoseLogic の出力は全フレームで一致（legacy_reset の両方）")
+    return True
+
+def bench():
+    print(f"{'people':>6} {'dict[us]':>9} {'vector[us]':>11}")
+    for n in (1, 2, 6, 12, 24, 48):
+        smiles = {pid: 0.3 for pid in range(n)}
+        seq = [(1/30, smiles)] * 2000
+        res = []
+        for cls in (NoseLogic, VectorNoseLogic):
+            t0 = time.perf_counter(); run(cls, seq); t1 = time.perf_counter()
+            res.append((t1 - t0) / len(seq) * 1e6)
+        print(f"{n:>6} {res[0]:>9.1f} {res[1]:>11.1f}")
+
+if __name__ == "__main__":
+    ok = check()
+    bench()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,71 @@
+# bench_overlay.py — overlay_image_alpha（float 参照実装）と overlay_image_premul（整数版）の比較
+#   python bench_overlay.py            … 一致確認（各チャンネル誤差1以内）＋速度比較
+import sys
+import time
+
+import numpy as np
+
+from utils import overlay_image_alpha, overlay_image_premul, premultiply_sprite
+
+FRAME_W, FRAME_H = 1280, 720
+SIZES = (32, 96, 200, 400, 700)
+REPEAT = 50
+
+def make_sprite(size, rng):
+    """ランダム色＋なめらかなアルファのテスト用スプライト。"""
+    bgr = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    alpha = rng.integers(0, 256, (size, size), dtype=np.uint8)
+    alpha[: size // 4] = 0
+    alpha[-size // 4:] = 255
+    return bgr, alpha
+
+def positions(size):
+    """画面内・左上はみ出し・右下はみ出し・完全に画面外。"""
+    return {
+        "inside":   (FRAME_W // 2 - size // 2, FRAME_H // 2 - size // 2),
+        "clip_tl":  (-size // 3, -size // 2),
+        "clip_br":  (FRAME_W - size // 2, FRAME_H - size // 3),
+        "outside":  (FRAME_W + 5, FRAME_H + 5),
+    }
+
+def check(rng):
+    worst = 0
+    for size in SIZES:
+        bgr, alpha = make_sprite(size, rng)
+        premul, inv = premultiply_sprite(bgr, alpha)
+        for name, pos in positions(size).items():
+            frame = rng.integers(0, 256, (FRAME_H, FRAME_W, 3), dtype=np.uint8)
+            ref = frame.copy(); out = frame.copy()
+            overlay_image_alpha(ref, bgr, pos, alpha / 255.0)
+            overlay_image_premul(out, premul, inv, pos)
+            err = int(np.abs(ref.astype(np.int16) - out).max())
+            worst = max(worst, err)
+            if err > 1:
+                print(f"NG size={size} {name}: max abs err {err}")
+                return False
+    print(f"OK: max abs err {worst} (<= 1)")
+    return True
+
+def bench(rng):
+    frame = rng.integers(0, 256, (FRAME_H, FRAME_W, 3), dtype=np.uint8)
+    print(f"{'size':>5} {'pos':>8} {'float[ms]':>10} {'int[ms]':>8} {'x':>5}")
+    for size in SIZES:
+        bgr, alpha = make_sprite(size, rng)
+        alpha_f = alpha / 255.0
+        premul, inv = premultiply_sprite(bgr, alpha)
+        for name, pos in positions(size).items():
+            if name == "outside":
+                continue
+            t0 = time.perf_counter()
+            for _ in range(REPEAT): overlay_image_alpha(frame, bgr, pos, alpha_f)
+            t1 = time.perf_counter()
+            for _ in range(REPEAT): overlay_image_premul(frame, premul, inv, pos)
+            t2 = time.perf_counter()
+            a = (t1 - t0) / REPEAT * 1e3; b = (t2 - t1) / REPEAT * 1e3
+            print(f"{size:>5} {name:>8} {a:>10.3f} {b:>8.3f} {a / b:>5.1f}")
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    ok = check(rng)
+    bench(rng)
+    sys.exit(0 if ok else 1)
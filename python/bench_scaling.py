@@ -0,0 +1,176 @@
+# bench_scaling.py — 人数（0〜12人）と解像度（480p/720p/1080p）ごとの1フレームの処理時間・FPS・メモリ
+#   python bench_scaling.py -o scaling.json                      … 全組み合わせを測って JSON に保存
+#   python bench_scaling.py -o new.json --compare scaling.json   … 前回より遅くなった組み合わせがあれば終了コード 1
+#   python bench_scaling.py --faces 0,6,12 --res 720 --set face_mesh_mode=roi
+# フレームは assets/test-face.jpg を重ねた合成（frame_sources.crowd_frames、seed 固定）なので、同じ環境なら同じ入力になる。
+# 計るのは画面・カメラ・音なしの FrameProcessor.process と、割当の人への鼻の描画。
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from glob import glob
+
+import cv2
+import numpy as np
+
+from app_config import load_config
+from frame_processor import FrameProcessor
+from frame_sources import crowd_frames
+from metrics import StageMetrics, process_memory
+from sprite_cache import draw_nose, load_sprites
+
+RESOLUTIONS = {480: (854, 480), 720: (1280, 720), 1080: (1920, 1080)}
+FACES = (0, 1, 2, 4, 6, 8, 12)
+
+
+def run_case(processor, sprites, n_faces, size, frames, warmup, mem_frames, seed):
+    """1つの（人数, 解像度）を測る。先頭 warmup フレームは数えない。最後の mem_frames だけ tracemalloc を掛ける。"""
+    metrics = StageMetrics(window=max(frames, 1))
+    idle = StageMetrics(enabled=False)   # warmup / tracemalloc 中は計らない
+    processor.reset(seed)
+    tracks = meshed = 0
+    py_peak = 0.0
+    frame_ns = []
+    source = crowd_frames(warmup + frames + mem_frames, n_faces, size=size, seed=seed)
+    for i, (ts, frame) in enumerate(source):
+        timed = warmup <= i < warmup + frames
+        m = processor.metrics = metrics if timed else idle
+        if i == warmup + frames:
+            tracemalloc.start()
+        t0 = time.perf_counter_ns()
+        res = processor.process(frame, ts)
+        with m.stage("overlay"):
+            draw_nose(frame, res, sprites)
+        if timed:
+            frame_ns.append(time.perf_counter_ns() - t0)
+            metrics.record("frame", frame_ns[-1])
+            tracks += len(res["objects"]); meshed += len(res["landmarks_by_id"])
+    if tracemalloc.is_tracing():
+        py_peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    summary = metrics.summary()
+    mean_ms = float(np.mean(frame_ns)) / 1e6 if frame_ns else 0.0
+    rss, _ = process_memory()
+    return {
+        "faces":       n_faces,
+        "size":        list(size),
+        "frames":      frames,
+        "fps":         round(1e3 / mean_ms, 2) if mean_ms > 0 else 0.0,
+        "frame_ms":    summary.get("frame"),
+        "stages":      {k: v for k, v in summary.items() if k != "frame"},
+        "mean_tracks": round(tracks / frames, 2) if frames else 0.0,
+        "mean_meshed": round(meshed / frames, 2) if frames else 0.0,   # FaceMesh が取れた人数（max_faces で頭打ち）
+        "counters":    dict(metrics.counter_items()),
+        "py_peak_mb":  round(py_peak, 2),
+        "rss_mb":      round(rss, 1) if rss is not None else None,
+    }
+
+
+def environment(cfg_overrides, args):
+    """比べてよい結果かどうかを見るための情報（違えば compare で警告する）。"""
+    try:
+        import mediapipe
+        mp_version = mediapipe.__version__
+    except Exception:
+        mp_version = None
+    return {
+        "platform":  platform.platform(),
+        "machine":   platform.machine(),
+        "cpu":       platform.processor(),
+        "python":    platform.python_version(),
+        "numpy":     np.__version__,
+        "opencv":    cv2.__version__,
+        "mediapipe": mp_version,
+        "config":    cfg_overrides,
+        "frames":    args.frames,
+        "warmup":    args.warmup,
+        "seed":      args.seed,
+    }
+
+
+def compare(result, baseline, threshold):
+    """baseline より fps が threshold 以上落ちた組み合わせを返す（[(キー, 前, 今), ...]）。"""
+    if result["env"] != baseline.get("env"):
+        diff = [k for k in result["env"] if result["env"][k] != baseline.get("env", {}).get(k)]
+        print(f"warning: environment differs from baseline ({', '.join(diff)})", file=sys.stderr)
+    base = {c["key"]: c for c in baseline.get("cases", [])}
+    worse = []
+    print(f"{'case':>10} {'base fps':>9} {'fps':>8} {'change':>7}")
+    for c in result["cases"]:
+        b = base.get(c["key"])
+        if b is None or b["fps"] <= 0:
+            continue
+        change = c["fps"] / b["fps"] - 1.0
+        flag = " <-- regression" if change < -threshold else ""
+        print(f"{c['key']:>10} {b['fps']:>9.1f} {c['fps']:>8.1f} {change * 100:>6.1f}%{flag}")
+        if flag:
+            worse.append((c["key"], b["fps"], c["fps"]))
+    return worse
+
+
+def parse_set(items):
+    out = {}
+    for item in items:
+        key, _, value = item.partition("=")
+        try:
+            out[key] = json.loads(value)
+        except json.JSONDecodeError:
+            out[key] = value
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Nose Mirror scaling benchmark")
+    ap.add_argument("-o", "--out", default="", help="結果の JSON（省略時は表だけ）")
+    ap.add_argument("--faces", default=",".join(map(str, FACES)), help="人数（カンマ区切り）")
+    ap.add_argument("--res", default="480,720,1080", help="解像度の高さ（カンマ区切り: 480/720/1080）")
+    ap.add_argument("--frames", type=int, default=120, help="1つの組み合わせで計るフレーム数")
+    ap.add_argument("--warmup", type=int, default=15, help="計らない先頭のフレーム数（モデル生成を含む）")
+    ap.add_argument("--mem-frames", type=int, default=10, help="最後に tracemalloc を掛けて回すフレーム数")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="設定の上書き（複数可）")
+    ap.add_argument("--compare", help="前回の結果 JSON。fps が --threshold 以上落ちたら終了コード 1")
+    ap.add_argument("--threshold", type=float, default=0.15, help="遅くなったとみなす fps の低下率")
+    args = ap.parse_args(argv)
+
+    overrides = parse_set(args.set)
+    cfg = {**load_config(), **overrides}
+    faces = [int(v) for v in args.faces.split(",")]
+    sizes = [RESOLUTIONS[int(v)] for v in args.res.split(",")]
+    processor = FrameProcessor(cfg, n_images=max(1, len(glob("assets/nose_*.png"))), seed=args.seed)
+    processor.debug_overlay = False
+    sprites = load_sprites()
+
+    cases = []
+    print(f"{'case':>10} {'fps':>8} {'p50[ms]':>8} {'p95[ms]':>8} {'tracks':>7} {'meshed':>7} {'py_peak':>8}")
+    for size in sizes:
+        for n in faces:
+            c = run_case(processor, sprites, n, size, args.frames, args.warmup, args.mem_frames, args.seed)
+            c["key"] = f"{size[1]}p/{n}"
+            cases.append(c)
+            f = c["frame_ms"] or {"p50_ms": 0.0, "p95_ms": 0.0}
+            print(f"{c['key']:>10} {c['fps']:>8.1f} {f['p50_ms']:>8.2f} {f['p95_ms']:>8.2f} "
+                  f"{c['mean_tracks']:>7.2f} {c['mean_meshed']:>7.2f} {c['py_peak_mb']:>7.1f}M")
+
+    _, peak = process_memory()
+    result = {"env": environment(overrides, args), "peak_rss_mb": round(peak, 1) if peak else None,
+              "cases": cases}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            worse = compare(result, json.load(f), args.threshold)
+        if worse:
+            print(f"{len(worse)} case(s) slower than baseline by more than {args.threshold * 100:.0f}%",
+                  file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,29 @@
 # centroid_tracker.py
 
+import heapq
+
 import numpy as np
+from scipy.optimize import linear_sum_assignment
 from scipy.spatial import distance
 
+# 1280x720 で 50px 相当（フレームの対角線に対する割合）
+DEFAULT_GATE_FRAC = 50 / float(np.hypot(1280, 720))
+
+
 class CentroidTracker:
-    def __init__(self, max_disappeared=50):
+    def __init__(self, max_disappeared=50, gate_frac=DEFAULT_GATE_FRAC, gate_px=50):
         """
         max_disappeared: 追跡中に顔が何フレーム連続で検出されなくても保持するか（閾値）。
+        gate_frac: 同一人物とみなす距離の上限（フレーム対角線に対する割合）。
+        gate_px: frame_size が渡されない時の上限（px）。
         """
         self.nextObjectID = 0
-        self.availableIDs = []
+        self.availableIDs = []     # 空きID（heapq。小さいIDから再利用）
         self.objects = dict()       # objectID -> (centroid_x, centroid_y)
         self.disappeared = dict()   # objectID -> 連続で検出されなかったフレーム数
         self.max_disappeared = max_disappeared
+        self.gate_frac = gate_frac
+        self.gate_px = gate_px
 
     def register(self, centroid):
         """
@@ -22,12 +33,13 @@ class CentroidTracker:
         # self.disappeared[self.nextObjectID] = 0
         # self.nextObjectID += 1
         if self.availableIDs:
-            objectID = self.availableIDs.pop(0)
+            objectID = heapq.heappop(self.availableIDs)
         else:
             objectID = self.nextObjectID
             self.nextObjectID += 1
         self.objects[objectID] = centroid
         self.disappeared[objectID] = 0
+        return objectID
 
     def deregister(self, objectID):
         """
@@ -35,13 +47,13 @@ class CentroidTracker:
         """
         del self.objects[objectID]
         del self.disappeared[objectID]
-        self.availableIDs.append(objectID)
-        self.availableIDs.sort()
+        heapq.heappush(self.availableIDs, objectID)
 
-    def update(self, rects):
+    def update(self, rects, frame_size=None):
         """
         rects: [(x, y, w, h), ...] のリスト
             MediaPipe Face Detection から得た矩形を pixel 座標で与える
+        frame_size: (w, h)。渡すと距離の上限をフレームサイズ基準にする（カメラを替えても同じ基準）
         return: self.objects (objectID -> centroid)
         """
         # (1) もし矩形がひとつもなければ、すべての objectID を disappeared カウントする
@@ -71,6 +83,8 @@ class CentroidTracker:
             objectIDs = list(self.objects.keys())
             objectCentroids = list(self.objects.values())
             D = distance.cdist(np.array(objectCentroids), input_centroids)
+            max_dist = (self.gate_frac * float(np.hypot(*frame_size))
+                        if frame_size is not None else self.gate_px)
 
             # (5) 最小距離順にマッチング
             rows = D.min(axis=1).argsort()
@@ -82,8 +96,8 @@ class CentroidTracker:
             for (row, col) in zip(rows, cols):
                 if row in usedRows or col in usedCols:
                     continue
-                if D[row, col] > 50:
-                    # もし距離が 50px を超えていたら別人とみなす
+                if D[row, col] > max_dist:
+                    # もし距離が上限（720p で 50px 相当）を超えていたら別人とみなす
                     continue
                 objectID = objectIDs[row]
                 self.objects[objectID] = input_centroids[col]
@@ -105,3 +119,92 @@ class CentroidTracker:
                 self.register(input_centroids[col])
 
         return self.objects
+
+
+class AssignmentTracker(CentroidTracker):
+    """
+    CentroidTracker と同じ使い方（update(rects) -> {id: centroid}）で、
+      - 等速モデルで次の位置を予測し、予測位置と検出の距離で対応付け
+      - 対応付けは全体最適（ハンガリアン法 linear_sum_assignment）→ すれ違いでIDが入れ替わりにくい
+      - 対応とみなす距離（ゲート）は解像度/顔の大きさに比例:
+          max(gate_frac × フレーム対角, box_gate × 検出矩形の長辺)
+    frame_size=(w, h) を update に渡すとフレーム基準のゲートが効く（省略時は対角の代わりに min_gate_px）。
+    """
+    def __init__(self, max_disappeared=50, gate_frac=0.05, box_gate=0.6, min_gate_px=50,
+                 velocity_alpha=0.5, max_predict_frames=10):
+        super().__init__(max_disappeared)
+        self.gate_frac          = gate_frac
+        self.box_gate           = box_gate
+        self.min_gate_px        = min_gate_px
+        self.velocity_alpha     = velocity_alpha      # 速度EMAの係数
+        self.max_predict_frames = max_predict_frames  # 見失い中に外挿する最大フレーム数
+        self.velocity = dict()   # objectID -> np.array([vx, vy])（px/フレーム）
+
+    def register(self, centroid):
+        objectID = super().register(centroid)
+        self.velocity[objectID] = np.zeros(2)
+        return objectID
+
+    def deregister(self, objectID):
+        super().deregister(objectID)
+        del self.velocity[objectID]
+
+    def _predicted(self, objectIDs):
+        c = np.array([self.objects[oid] for oid in objectIDs], dtype=float)
+        v = np.array([self.velocity[oid] for oid in objectIDs])
+        steps = np.minimum([self.disappeared[oid] + 1 for oid in objectIDs], self.max_predict_frames)
+        return c + v * steps[:, None]
+
+    def _miss(self, objectID):
+        self.disappeared[objectID] += 1
+        if self.disappeared[objectID] > self.max_disappeared:
+            self.deregister(objectID)
+
+    def update(self, rects, frame_size=None):
+        if len(rects) == 0:
+            for objectID in list(self.disappeared.keys()):
+                self._miss(objectID)
+            return self.objects
+
+        r = np.asarray(rects, dtype=float).reshape(-1, 4)
+        input_centroids = (r[:, :2] + r[:, 2:] / 2).astype("int")
+
+        if len(self.objects) == 0:
+            for c in input_centroids:
+                self.register(c)
+            return self.objects
+
+        objectIDs = list(self.objects.keys())
+        D = distance.cdist(self._predicted(objectIDs), input_centroids)
+
+        # ゲート（検出ごと）
+        # 下限は frame_size があればフレーム対角の割合、無ければ min_gate_px
+        floor = (self.gate_frac * float(np.hypot(*frame_size))
+                 if frame_size is not None else self.min_gate_px)
+        gate = np.maximum(self.box_gate * r[:, 2:].max(axis=1), floor)
+        allowed = D <= gate[None, :]
+
+        usedRows, usedCols = set(), set()
+        if allowed.any():
+            cost = np.where(allowed, D, D.max() * 10 + 1e6)
+            for row, col in zip(*linear_sum_assignment(cost)):
+                if not allowed[row, col]:
+                    continue
+                objectID = objectIDs[row]
+                new_c = input_centroids[col]
+                steps = self.disappeared[objectID] + 1
+                step_v = (new_c - np.asarray(self.objects[objectID], dtype=float)) / steps
+                a = self.velocity_alpha
+                self.velocity[objectID] = self.velocity[objectID] * (1 - a) + step_v * a
+                self.objects[objectID] = new_c
+                self.disappeared[objectID] = 0
+                usedRows.add(row); usedCols.add(col)
+
+        for row in range(len(objectIDs)):
+            if row not in usedRows:
+                self._miss(objectIDs[row])
+        for col in range(len(input_centroids)):
+            if col not in usedCols:
+                self.register(input_centroids[col])
+
+        return self.objects
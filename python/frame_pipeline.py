@@ -0,0 +1,230 @@
+# frame_pipeline.py — キャプチャ／推論／描画を分離するスレッドパイプライン
+import threading
+import time
+from collections import namedtuple
+
+# seq: 連番, ts: 取得時刻(monotonic), image: BGRフレーム
+FramePacket = namedtuple("FramePacket", "seq ts image")
+
+
+class LatestSlot:
+    """
+    容量1のキュー。put は常に上書き、get は最新の1件だけを取り出す。
+    古いフレームは溜めずに捨てる（カメラ側の遅延が積み上がらない）。
+    """
+    def __init__(self):
+        self._cond    = threading.Condition()
+        self._item    = None
+        self._has     = False
+        self._closed  = False
+        self.dropped  = 0   # 取り出される前に上書きされた件数
+
+    def put(self, item):
+        with self._cond:
+            if self._has:
+                self.dropped += 1
+            self._item = item
+            self._has = True
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """最新の1件を返す。timeout 内に来なければ（またはclose済みなら）None。"""
+        with self._cond:
+            if not self._has and not self._closed:
+                self._cond.wait(timeout)
+            if not self._has:
+                return None
+            item, self._item, self._has = self._item, None, False
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class CameraController:
+    """
+    カメラの読み込み・切り替え・再接続をバックグラウンドで行い、最新フレームを out_slot に置く。
+      - request_camera(index): 新しいカメラは別スレッドで開き、最初のフレームが読めてから差し替える
+        （開けない/読めない時は今のカメラのまま。表示は止まらない）。
+      - 監視: stall_timeout 秒フレームが来ない、または read() が失敗したら今のカメラを捨て、
+        同じ番号を backoff 秒おき（失敗するたびに倍、最大 backoff_max）に開き直す。
+      - 最初から開けない場合も終了せずに開き直しを続ける。
+    metrics に camera_switch / camera_reconnect / camera_stall / camera_open_fail の回数と、
+    開いてから最初のフレームまでの時間（ステージ名 camera_first_frame）を記録する。
+    """
+    def __init__(self, open_fn, index, out_slot, metrics=None,
+                 stall_timeout=2.0, first_frame_timeout=5.0, backoff=0.5, backoff_max=10.0):
+        self._open_fn   = open_fn      # index -> cap or None
+        self._out       = out_slot
+        self._metrics   = metrics
+        self.stall_timeout       = float(stall_timeout)
+        self.first_frame_timeout = float(first_frame_timeout)
+        self.backoff_min = float(backoff)
+        self.backoff_max = float(backoff_max)
+
+        self._lock      = threading.Lock()
+        self._stop_ev   = threading.Event()
+        self._cap       = None
+        self._gen       = 0            # 差し替えのたびに増やす（古い読み込みスレッドを止める）
+        self._reader    = None         # 今のカメラの読み込みスレッド（カメラの release もこのスレッドが行う）
+        self._wanted    = int(index)   # 開きたいカメラ番号
+        self._opening   = None         # 開いている最中の番号
+        self._next_try  = 0.0
+        self._backoff   = self.backoff_min
+        self._last_frame = time.monotonic()
+        self.index      = None         # 今映しているカメラ番号
+        self.seq        = 0
+        self._thread    = threading.Thread(target=self._supervise, name="camera", daemon=True)
+
+    # ---- 外から ----
+    def start(self):
+        self._thread.start()
+        return self
+
+    def request_camera(self, index):
+        with self._lock:
+            self._wanted   = int(index)
+            self._next_try = 0.0
+            self._backoff  = self.backoff_min
+
+    def stop(self):
+        self._stop_ev.set()
+        self._thread.join(timeout=2.0)
+        with self._lock:
+            self._cap = None
+            self._gen += 1
+            reader = self._reader
+        if reader is not None:
+            reader.join(timeout=2.0)   # read() から戻ったところで自分のカメラを release する
+
+    @property
+    def connected(self):
+        return self._cap is not None
+
+    # ---- 内部 ----
+    def _count(self, name):
+        if self._metrics is not None:
+            self._metrics.count(name)
+
+    def _supervise(self):
+        while not self._stop_ev.wait(0.05):
+            now = time.monotonic()
+            with self._lock:
+                cap, wanted, opening = self._cap, self._wanted, self._opening
+                stalled = cap is not None and now - self._last_frame > self.stall_timeout
+            if stalled:
+                print(f"カメラ {self.index} からフレームが来ません。開き直します。")
+                self._count("camera_stall")
+                self._drop(cap)
+                cap = None
+            if opening is None and now >= self._next_try and (cap is None or wanted != self.index):
+                with self._lock:
+                    self._opening = wanted
+                threading.Thread(target=self._open, args=(wanted,),
+                                 name="camera-open", daemon=True).start()
+
+    def _drop(self, cap):
+        """
+        今のカメラを捨てる。_gen を進めるだけで、release は読み込みスレッドが read() から戻った後に自分で行う
+        （read() 中の VideoCapture を別スレッドから release しない）。
+        """
+        with self._lock:
+            if self._cap is not cap:
+                return
+            self._cap = None
+            self._gen += 1
+            self._next_try = time.monotonic() + self._backoff
+
+    def _open(self, index):
+        t0 = time.perf_counter_ns()
+        cap, first = self._open_fn(index), None
+        if cap is not None:
+            deadline = time.monotonic() + self.first_frame_timeout
+            while first is None and time.monotonic() < deadline and not self._stop_ev.is_set():
+                ret, frame = cap.read()
+                if ret:
+                    first = frame
+        with self._lock:
+            self._opening = None
+            ok = first is not None and not self._stop_ev.is_set() and self._wanted == index
+            wait = self._backoff
+            if not ok:
+                self._next_try = time.monotonic() + wait
+                self._backoff  = min(self.backoff_max, wait * 2)
+            else:
+                self._cap = cap   # 前のカメラは _gen が進んだので、その読み込みスレッドが release する
+                self._gen += 1
+                gen = self._gen
+                was = self.index
+                self.index = index
+                self._backoff = self.backoff_min
+                self._last_frame = time.monotonic()
+        if not ok:
+            if cap is not None:
+                cap.release()
+            if first is None:
+                print(f"カメラ {index} を開けませんでした（{wait:.1f} 秒後に再試行）。")
+                self._count("camera_open_fail")
+            return
+
+        if self._metrics is not None:
+            self._metrics.record("camera_first_frame", time.perf_counter_ns() - t0)
+        if was is not None:
+            self._count("camera_switch" if was != index else "camera_reconnect")
+        self._put(first)
+        reader = threading.Thread(target=self._read_loop, args=(cap, gen), name="capture", daemon=True)
+        with self._lock:
+            self._reader = reader
+        reader.start()
+
+    def _put(self, frame):
+        self._out.put(FramePacket(self.seq, time.monotonic(), frame))
+        self.seq += 1
+
+    def _read_loop(self, cap, gen):
+        try:
+            while not self._stop_ev.is_set() and gen == self._gen:
+                ret, frame = cap.read()
+                if gen != self._gen:
+                    break   # 差し替え済み（このカメラは捨てられた）
+                if not ret:
+                    print(f"カメラ {self.index} の読み込みに失敗しました。開き直します。")
+                    self._count("camera_stall")
+                    self._drop(cap)
+                    break
+                with self._lock:
+                    self._last_frame = time.monotonic()
+                self._put(frame)
+        finally:
+            # このカメラを読むのはこのスレッドだけなので、read() から戻ったここで release する
+            cap.release()
+
+
+class InferenceWorker(threading.Thread):
+    """
+    in_slot の最新フレームに process_fn(frame, ts) を適用し、
+    (FramePacket, result) を out_slot に置く。例外は error に保持して停止する。
+    """
+    def __init__(self, process_fn, in_slot, out_slot, stop_event):
+        super().__init__(name="inference", daemon=True)
+        self._process = process_fn
+        self._in      = in_slot
+        self._out     = out_slot
+        self._stop_ev = stop_event
+        self.error    = None
+
+    def run(self):
+        try:
+            while not self._stop_ev.is_set():
+                pkt = self._in.get(timeout=0.1)
+                if pkt is None:
+                    continue
+                result = self._process(pkt.image, pkt.ts)
+                self._out.put((pkt, result))
+        except Exception as e:
+            self.error = e
+        finally:
+            self._stop_ev.set()
+            self._out.close()
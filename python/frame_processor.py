@@ -0,0 +1,625 @@
+# frame_processor.py — 1フレーム分の 検出→追跡→笑顔→割当→倍率更新（表示・音・UIなし）
+import math
+import random
+
+import cv2
+import numpy as np
+
+from centroid_tracker import CentroidTracker, AssignmentTracker
+from nose_logic import (NoseLogic, VectorNoseLogic, compute_smile_scores, compute_nose_base_sizes,
+                        compute_nose_base_size, NOSE_TIP)
+from landmarks import extract_batch, split_faces, registered_index
+from keyframe import KeyframeScheduler, landmarks_box, face_motion
+from stage_graph import StageGraph
+from hog_fallback import FastHogDetector
+from roi_mesh import RoiMeshBatcher
+from reid import ReIdCache, signature
+from metrics import StageMetrics
+
+# 面積の閾値はフレーム面積に対する割合（1280x720 で 5000px² 相当）。カメラを替えても同じ基準
+MIN_BODY_BOX_FRAC           = 5000 / (1280 * 720)
+VISIBILITY_THRESH           = 0.5
+IOU_THRESH                  = 0.3
+FALLBACK_MIN_FRAC           = MIN_BODY_BOX_FRAC
+
+
+def min_box_area(w, h, frac=MIN_BODY_BOX_FRAC):
+    """フレーム (w, h) での最小ボックス面積（px²）。"""
+    return frac * w * h
+
+
+def inference_scale(w, h, iw=0, ih=0):
+    """
+    フレーム (w, h) を推論解像度 (iw, ih) に収める縮小率（拡大はしない）。
+    0 の辺はもう一方に合わせる。両方 0 ならそのまま（1.0）。
+    """
+    scales = [s for s in ((iw / w) if iw > 0 else None, (ih / h) if ih > 0 else None) if s]
+    return min([1.0] + scales)
+
+
+def bbox_iou(a, b):
+    xA = max(a[0], b[0]); yA = max(a[1], b[1])
+    xB = min(a[0]+a[2], b[0]+b[2]); yB = min(a[1]+a[3], b[1]+b[3])
+    interW = max(0, xB - xA); interH = max(0, yB - yA)
+    interA = interW * interH
+    union = a[2]*a[3] + b[2]*b[3] - interA
+    return interA / union if union > 0 else 0
+
+
+def scale_rects(rects, s):
+    """[(x, y, w, h), ...] を s 倍する（推論座標 → 表示座標）。"""
+    if s == 1.0:
+        return list(rects)
+    return [(int(x*s), int(y*s), int(bw*s), int(bh*s)) for x, y, bw, bh in rects]
+
+
+# ──────────────────────────────────────────────
+# モデル生成と結果の取り出し（ワーカープロセスからも使う）
+# ──────────────────────────────────────────────
+def create_hog_fallback(cfg):
+    hog = cv2.HOGDescriptor()
+    hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+    # 縮小＋ROI＋結果再利用の HOG 補完（座標はフル解像度で返る）
+    return FastHogDetector(
+        hog,
+        downscale=float(cfg.get("hog_downscale", 0.5)),
+        reuse_frames=int(cfg.get("hog_reuse_frames", 5)),
+    )
+
+
+def create_pose_model(complexity=1):
+    import mediapipe as mp
+    # MediaPipe Pose（キーワードで）
+    return mp.solutions.pose.Pose(
+        static_image_mode=False,
+        model_complexity=complexity,
+        smooth_landmarks=True,
+        enable_segmentation=False,
+        smooth_segmentation=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+def create_face_detection():
+    import mediapipe as mp
+    return mp.solutions.face_detection.FaceDetection(
+        model_selection=0, min_detection_confidence=0.5)
+
+
+def create_face_mesh(max_faces=6):
+    import mediapipe as mp
+    return mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=False,
+        max_num_faces=max_faces,
+        refine_landmarks=False,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+def pose_bbox_from(pose_res, w, h):
+    """
+    Pose の結果から体のボックス (x, y, w, h)。肩・腰が見えていなければ None。
+    MediaPipe の座標は 0〜1 なので、(w, h) に表示側の大きさを渡せばそのまま表示座標になる。
+    """
+    if not pose_res.pose_landmarks:
+        return None
+    from mediapipe.python.solutions.pose import PoseLandmark
+    lm = pose_res.pose_landmarks.landmark
+    key_ids = [PoseLandmark.LEFT_SHOULDER.value, PoseLandmark.RIGHT_SHOULDER.value,
+               PoseLandmark.LEFT_HIP.value, PoseLandmark.RIGHT_HIP.value]
+    avg_vis = sum(lm[i].visibility for i in key_ids) / len(key_ids)
+    if avg_vis > VISIBILITY_THRESH:
+        coords = [(int(l.x*w), int(l.y*h)) for l in lm]
+        xs, ys = zip(*coords)
+        x0, x1 = max(min(xs), 0), min(max(xs), w)
+        y0, y1 = max(min(ys), 0), min(max(ys), h)
+        bw, bh = x1-x0, y1-y0
+        if bw*bh >= min_box_area(w, h):
+            return (x0, y0, bw, bh)
+    return None
+
+
+def face_boxes_from(face_res, w, h):
+    """Face Detection の結果から顔ボックスのリスト。"""
+    boxes = []
+    min_area = min_box_area(w, h)
+    if face_res.detections:
+        for det in face_res.detections:
+            bb = det.location_data.relative_bounding_box
+            x1 = int(bb.xmin*w); y1 = int(bb.ymin*h)
+            bw = int(bb.width*w); bh = int(bb.height*h)
+            if bw*bh >= min_area:
+                boxes.append((x1, y1, bw, bh))
+    return boxes
+
+
+# process() の結果を1人1行の表にする時の列（配信・バッチ出力で共通）
+TRACK_DTYPE = np.dtype([("id", np.int32), ("cx", np.float32), ("cy", np.float32),
+                        ("nose_x", np.float32), ("nose_y", np.float32), ("base_size", np.float32),
+                        ("smile", np.float32), ("scale", np.float32)])
+
+
+def track_table(res):
+    """process() の結果 -> TRACK_DTYPE の配列（ID 順）。ランドマークの無いトラックは鼻・サイズ・笑顔・倍率が NaN。"""
+    objects = res["objects"]
+    recs = np.empty(len(objects), dtype=TRACK_DTYPE)
+    for i, oid in enumerate(sorted(objects)):
+        cx, cy = objects[oid]
+        pts = res["landmarks_by_id"].get(oid)
+        if pts is not None:
+            nx, ny, _ = pts[NOSE_TIP]
+            base = res["base_size_by_id"][oid]
+        else:
+            nx = ny = base = math.nan
+        recs[i] = (oid, cx, cy, nx, ny, base,
+                   res["smile_by_id"].get(oid, math.nan), res["nose_scales"].get(oid, math.nan))
+    return recs
+
+
+class FrameClock:
+    """フレームのタイムスタンプを「現在時刻」として返す時計（NoseLogic などに注入する）。"""
+    def __init__(self, t=0.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+class FrameProcessor:
+    """
+    process(frame, frame_ts) -> 結果 dict
+      時刻はすべて frame_ts（フレーム取得時刻, 秒）を使うので、録画を実時間より速く
+      流しても結果は同じになる（seed を固定すれば割当の乱数も再現する）。
+    cfg: load_config() の dict, n_images: 鼻画像の枚数（割当で画像番号を選ぶ）
+    metrics: StageMetrics（省略時は計測しない）
+    remote: ModelWorkerPool（model_workers.py）。指定するとモデルは別プロセスで回し、
+            その結果をステージの出力として置く（このプロセスでは MediaPipe/HOG を回さない）
+    """
+    def __init__(self, cfg, n_images, seed=None, metrics=None, remote=None):
+        self.n_images      = n_images
+        self.remote        = remote
+        self.metrics       = metrics or StageMetrics(enabled=False)
+        self.swap_interval = float(cfg.get("swap_sec", 15.0))
+        self.debug_overlay = bool(int(cfg.get("debug_overlay", 1)))
+        self.clock         = FrameClock()
+
+        self.hog_fallback  = create_hog_fallback(cfg)
+        self.hog_downscale = self.hog_fallback.downscale   # 表示解像度に対する HOG の縮小率
+        # 推論解像度（0 ならカメラのまま）。検出は縮小した1枚を共有し、座標は表示側に戻す
+        self.infer_size    = (int(cfg.get("inference_width", 0)), int(cfg.get("inference_height", 0)))
+
+        # "roi": トラックごとの切り抜きをタイルに並べて FaceMesh（ID は切り抜きで決まる） / "full": 全体
+        self.roi_mesh = (RoiMeshBatcher(tile=int(cfg.get("face_mesh_roi_tile", 256)),
+                                        pad=float(cfg.get("face_mesh_roi_pad", 0.5)))
+                         if cfg.get("face_mesh_mode", "full") == "roi" else None)
+
+        # MediaPipe のモデルは初めて使う時に作る（mediapipe の import もその時）
+        self._pose_model = None
+        self._fd_model   = None
+        self._fm_model   = None
+
+        # 品質（quality.py の段階で変わる）
+        self.pose_complexity = 1
+        self.max_faces       = 6
+        self.allow_hog       = True
+        self.tier_height     = 0    # 推論解像度の高さの上限（0 なら制限なし）
+
+        # 追跡・笑顔・割当の状態
+        self._cfg = cfg
+        self.reset(seed)
+
+        self.graph = self._build_graph()
+
+    # ──────────────────────────────────────────────
+    # 状態
+    # ──────────────────────────────────────────────
+    def reset(self, seed=None):
+        """
+        追跡・笑顔・割当の状態を作り直す（品質の段階は apply_quality し直す）。
+        モデルは作り直さず、前のフレームを引き継ぐ状態（MediaPipe の追跡・HOG の再利用）だけを捨てる。
+        1プロセスで複数の録画を続けて処理する時、ファイルごとに呼ぶ（前のファイルの結果が混ざらない）。
+        """
+        cfg = self._cfg
+        self.rng = random.Random(seed)
+        self.hog_fallback.reset()
+        for model in (self._pose_model, self._fd_model, self._fm_model):
+            if model is not None:
+                model.reset()   # static_image_mode=False の追跡を切る
+        if self.remote is not None:
+            self.remote.reset()
+
+        # トラッカー＆ロジック
+        # "assignment": 予測＋全体最適の対応付け（すれ違いでIDが入れ替わりにくい） / "greedy": 従来
+        self.ct = (CentroidTracker if cfg.get("tracker", "assignment") == "greedy"
+                   else AssignmentTracker)(max_disappeared=300)
+        # "vector" で配列版（出力は同一。大人数向け）。"all" なら顔ぶれが変わるたびに全員を初期化（従来）
+        logic_cls = VectorNoseLogic if cfg.get("nose_logic_engine", "dict") == "vector" else NoseLogic
+        self.nose_logic = logic_cls(legacy_reset=cfg.get("nose_logic_reset", "changed") == "all",
+                                    clock=self.clock)
+        # 見失った人の状態を預かり、戻ってきたら（顔の形と色で見分けて）キャリブ済みのまま続ける
+        self.reid = (ReIdCache(capacity=int(cfg.get("reid_cache_size", 32)),
+                               ttl=float(cfg.get("reid_ttl_sec", 60.0)),
+                               max_dist=float(cfg.get("reid_max_dist", 0.35)))
+                     if int(cfg.get("reid_cache_size", 32)) > 0 else None)
+        self.reid_refresh = 0.5     # 見えている人の特徴を取り直す間隔（秒）
+        self._reid_sig    = {}      # id -> (特徴, 取った時刻)
+        self._reid_held   = {}      # id -> FaceMesh で取れなかった間の状態（トラックが消えるまで持つ）
+
+        # キーフレーム（検出間隔は顔の動きで min〜max の間を自動調整。両方1で毎フレーム検出）
+        self.keyframes = KeyframeScheduler(
+            min_interval=int(cfg.get("detect_interval_min", 2)),
+            max_interval=int(cfg.get("detect_interval_max", 10)),
+        )
+        self._base_interval = (self.keyframes.min_interval, self.keyframes.max_interval)
+        self.prev_landmarks_by_id = {}
+
+        # 割当ステート
+        self.assigned_id            = None
+        self.assigned_img_idx       = None
+        self.two_person_last_switch = None
+
+    # ──────────────────────────────────────────────
+    # MediaPipe モデル（遅延生成）
+    #   Pose は HOG補完の候補が出た時しか使わないので、出なければ一度も作られない
+    # ──────────────────────────────────────────────
+    @property
+    def pose_model(self):
+        if self._pose_model is None:
+            self._pose_model = create_pose_model(self.pose_complexity)
+        return self._pose_model
+
+    @property
+    def fd_model(self):
+        if self._fd_model is None:
+            self._fd_model = create_face_detection()
+        return self._fd_model
+
+    @property
+    def fm_model(self):
+        if self._fm_model is None:
+            self._fm_model = create_face_mesh(self.max_faces)
+        return self._fm_model
+
+    def apply_quality(self, tier):
+        """QualityTier を反映する。Pose/FaceMesh は設定が変わった時だけ作り直す（次に使う時）。"""
+        self.tier_height = tier.infer_height
+        lo, hi = self._base_interval
+        if tier.detect_interval is not None:
+            lo, hi = max(lo, tier.detect_interval[0]), max(hi, tier.detect_interval[1])
+        self.keyframes.min_interval, self.keyframes.max_interval = lo, hi
+        self.keyframes.interval = min(max(self.keyframes.interval, self.keyframes.min_interval),
+                                      self.keyframes.max_interval)
+        self.allow_hog = tier.allow_hog
+        if tier.pose_complexity != self.pose_complexity:
+            self.pose_complexity, self._pose_model = tier.pose_complexity, None
+        if tier.max_faces != self.max_faces:
+            self.max_faces, self._fm_model = tier.max_faces, None
+            if self.roi_mesh is not None:
+                self.roi_mesh.max_faces = tier.max_faces
+        if self.remote is not None:
+            self.remote.set_quality(tier.pose_complexity, tier.max_faces, tier.allow_hog)
+
+    def warm_up(self, size=(640, 480)):
+        """毎フレーム使う Face Detection / FaceMesh を作り、黒画像で1回ずつ回しておく。"""
+        if self.remote is not None:
+            self.remote.wait_ready()
+            return
+        blank = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        self.fd_model.process(blank)
+        self.fm_model.process(blank)
+
+    # ──────────────────────────────────────────────
+    # フレーム処理のステージグラフ（出力が読まれたステージだけ実行）
+    #   Pose は HOG補完が候補を見つけた時だけ、デバッグ表示は debug_overlay 時だけ走る
+    # ──────────────────────────────────────────────
+    def _build_graph(self):
+        g = StageGraph()
+        g.add("infer_frame",  self._stage_infer_frame,  inputs=("frame", "infer_scale"))
+        g.add("frame_rgb",    self._stage_frame_rgb,    inputs=("infer_frame",))
+        g.add("pose_bbox",    self._stage_pose_bbox,    inputs=("frame_rgb", "frame_size"))
+        g.add("face_boxes",   self._stage_face_boxes,   inputs=("frame_rgb", "frame_size"))
+        g.add("hog_rects",    self._stage_hog_rects,    inputs=("infer_frame", "infer_scale", "track_centroids"))
+        g.add("hog_boxes",    self._stage_hog_boxes,    inputs=("hog_rects", "pose_bbox", "frame_size"))
+        g.add("detect_boxes", self._stage_detect_boxes, inputs=("face_boxes", "hog_boxes"))
+        g.add("track_boxes",  self._stage_track_boxes,  inputs=("is_keyframe", "detect_boxes", "prev_landmarks"))
+        if self.roi_mesh is None:
+            g.add("face_mesh", self._stage_face_mesh, inputs=("frame_rgb", "frame_size"),
+                  outputs=("face_mesh", "mesh_ids"))
+        else:
+            g.add("face_mesh", self._stage_face_mesh_roi, inputs=("frame", "track_boxes", "objects", "prev_landmarks"),
+                  outputs=("face_mesh", "mesh_ids"))
+        g.add("debug_lines",  self._stage_debug_lines,  inputs=("current_faces", "remaining", "landmarks_by_id",
+                                                                "smile_by_id", "nose_scales", "assigned_id"))
+        return g
+
+    def _stage_infer_frame(self, inp):
+        # 推論用に1回だけ縮小する（全検出器で共有）
+        frame, scale = inp["frame"], inp["infer_scale"]
+        if scale >= 1.0:
+            return frame
+        h, w = frame.shape[:2]
+        return cv2.resize(frame, (round(w*scale), round(h*scale)), interpolation=cv2.INTER_AREA)
+
+    def _stage_frame_rgb(self, inp):
+        # MediaPipe 用の RGB。モデルを別プロセスで回す時は作らない
+        return cv2.cvtColor(inp["infer_frame"], cv2.COLOR_BGR2RGB)
+
+    # MediaPipe の座標は 0〜1 なので、表示側の (w, h) を掛ければそのまま表示座標になる
+    def _stage_pose_bbox(self, inp):
+        w, h = inp["frame_size"]
+        with self.metrics.stage("pose"):
+            pose_res = self.pose_model.process(inp["frame_rgb"])
+        return pose_bbox_from(pose_res, w, h)
+
+    def _stage_face_boxes(self, inp):
+        w, h = inp["frame_size"]
+        with self.metrics.stage("face_det"):
+            face_res = self.fd_model.process(inp["frame_rgb"])
+        return face_boxes_from(face_res, w, h)
+
+    def _stage_hog_rects(self, inp):
+        # ROI は直前までのトラック重心から決める（Pose を先に回さずに済む）
+        if not self.allow_hog:
+            return []   # 品質を落としている間は HOG補完を使わない
+        scale = inp["infer_scale"]
+        # 表示解像度に対する縮小率を保つ（推論フレームが既に小さければその分だけ縮小を緩める）
+        self.hog_fallback.downscale = min(1.0, self.hog_downscale / scale)
+        centroids = [(cx*scale, cy*scale) for cx, cy in inp["track_centroids"]]
+        with self.metrics.stage("hog"):
+            rects = self.hog_fallback.detect(inp["infer_frame"], centroids)
+        return scale_rects(rects, 1.0 / scale)
+
+    def _stage_hog_boxes(self, inp):
+        w, h = inp["frame_size"]
+        min_area, fallback_area = min_box_area(w, h), min_box_area(w, h, FALLBACK_MIN_FRAC)
+        boxes = []
+        for x, y, bw, bh in inp["hog_rects"]:
+            if bw*bh < min_area: continue
+            pose_bbox = inp["pose_bbox"]  # 候補があった時だけ Pose を実行
+            if pose_bbox and bbox_iou((x,y,bw,bh), pose_bbox) > IOU_THRESH:
+                boxes.append((x, y, bw, bh))
+            elif not pose_bbox and bw*bh >= fallback_area:
+                boxes.append((x, y, bw, bh))
+        return boxes
+
+    def _stage_detect_boxes(self, inp):
+        # 顔が取れなければ HOG補完
+        return inp["face_boxes"] or inp["hog_boxes"]
+
+    def _stage_track_boxes(self, inp):
+        if inp["is_keyframe"]:
+            return inp["detect_boxes"]
+        # キーフレーム間は前フレームの FaceMesh から追跡用ボックスを作る
+        return [landmarks_box(pts) for pts in inp["prev_landmarks"].values()]
+
+    def _stage_face_mesh(self, inp):
+        """
+        登録済みランドマークの (faces, K, 3) float32（表示座標。顔が無ければ faces=0）と、
+        各顔のトラックID（全体モードでは決まらないので None）。
+        """
+        w, h = inp["frame_size"]
+        with self.metrics.stage("face_mesh"):
+            fm_res = self.fm_model.process(inp["frame_rgb"])
+        return extract_batch(fm_res.multi_face_landmarks, w, h)[0], None
+
+    def _stage_face_mesh_roi(self, inp):
+        """
+        トラックごとの顔ボックスを切り抜いて FaceMesh。ID は切り抜き元のトラック。
+        ボックスは前フレームのランドマークがあればその外接矩形（検出が外れても追い続けられる）、
+        無ければこのフレームで対応付いた検出矩形。
+        """
+        prev = inp["prev_landmarks"]
+        # トラッカーの重心は矩形の中心（整数）なので、そこから ID ごとの矩形を引ける
+        by_centroid = {(int(x + bw/2), int(y + bh/2)): (x, y, bw, bh) for x, y, bw, bh in inp["track_boxes"]}
+        boxes = {}
+        for oid, (cx, cy) in inp["objects"].items():
+            box = landmarks_box(prev[oid]) if oid in prev else by_centroid.get((int(cx), int(cy)))
+            if box is not None:
+                boxes[oid] = box
+        with self.metrics.stage("face_mesh"):
+            mosaic = self.roi_mesh.build(inp["frame"], boxes)
+            if mosaic is None:
+                return np.empty((0, len(registered_index()[0]), 3), dtype=np.float32), []
+            fm_res = self.fm_model.process(cv2.cvtColor(mosaic, cv2.COLOR_BGR2RGB))
+        mh, mw = mosaic.shape[:2]
+        batch, col = extract_batch(fm_res.multi_face_landmarks, mw, mh)
+        return self.roi_mesh.map_back(batch, col)
+
+    def _stage_debug_lines(self, inp):
+        """デバッグパネルの文字列 [(text, (x, y), font_scale, color), ...]"""
+        current_faces   = inp["current_faces"]
+        landmarks_by_id = inp["landmarks_by_id"]
+        smile_by_id     = inp["smile_by_id"]
+        nose_scales     = inp["nose_scales"]
+        lines = [
+            (f"MODE: {len(current_faces)}人", (10, 30), 0.8, (0,255,0)),
+            (f"Flip in: {inp['remaining']:.1f}s", (10, 60), 0.8, (0,255,0)),
+        ]
+
+        # 簡易スコア・スケール
+        panel_x, panel_y = 10, 100
+        lines.append(("Smile Debug:", (panel_x, panel_y), 0.8, (0,200,255)))
+        y = panel_y + 28
+        for pid in sorted(landmarks_by_id.keys()):
+            s_val = float(smile_by_id.get(pid, 0.0))
+            sc    = float(nose_scales.get(pid, 0.0)) if nose_scales else 0.0
+            mark  = "*" if pid == inp["assigned_id"] else " "
+            lines.append((f"{mark}ID {pid}: s={s_val:.3f} sc={sc:.2f}", (panel_x, y), 0.7, (200,255,200)))
+            y += 22
+
+        # ステージの実行/スキップ回数
+        y += 10
+        lines.append(("Stages run/skip:", (panel_x, y), 0.7, (0,200,255)))
+        for name, (ran, skipped) in self.graph.stats().items():
+            y += 22
+            lines.append((f"{name}: {ran}/{skipped}", (panel_x, y), 0.6, (200,200,255)))
+        return lines
+
+    def _reid_step(self, frame, objects, landmarks_by_id, now):
+        """
+        FaceMesh で取れなかった人の状態はトラックが残っている間だけ手元に持ち、同じ ID で戻ればそのまま返す。
+        トラッカーが消した人だけをキャッシュへ預け、新しく現れた人は預かった中から探して状態を戻す。
+        """
+        live = self.nose_logic.ids_live
+        for pid in live - landmarks_by_id.keys():
+            self._reid_held[pid] = self.nose_logic.export_person(pid)
+        for pid in [pid for pid in self._reid_held if pid not in objects]:
+            sig = self._reid_sig.pop(pid, (None, 0.0))[0]
+            self.reid.put(pid, sig, self._reid_held.pop(pid), now)
+        for pid, pts in landmarks_by_id.items():
+            known = self._reid_sig.get(pid)
+            if known is None or now - known[1] >= self.reid_refresh:
+                sig = signature(frame, pts)
+                if sig is not None:
+                    self._reid_sig[pid] = (sig, now)
+            if pid in live:
+                continue
+            held = self._reid_held.pop(pid, None)
+            if held is not None:
+                self.nose_logic.import_person(pid, held)
+            elif pid in self._reid_sig:
+                state = self.reid.take(self._reid_sig[pid][0], now)
+                if state is not None:
+                    self.nose_logic.import_person(pid, state)
+                    self.metrics.count("reid_hit")
+
+    def _assign(self, current_faces, cur_time):
+        """鼻を付ける人（assigned_id）と画像番号を決める（元の流れ）。"""
+        if self.assigned_id is None:
+            if current_faces:
+                if len(current_faces) == 1:
+                    self.assigned_id = current_faces[0]
+                    self.two_person_last_switch = None
+                else:
+                    self.assigned_id = self.rng.choice(current_faces)
+                    self.two_person_last_switch = cur_time
+                self.assigned_img_idx = self.rng.randint(0, self.n_images-1)
+
+        elif self.assigned_id not in current_faces:
+            if not current_faces:
+                self.assigned_id = None; self.assigned_img_idx = None
+                self.two_person_last_switch = None
+            elif len(current_faces) == 1:
+                self.assigned_id = current_faces[0]
+                self.assigned_img_idx = self.rng.randint(0, self.n_images-1)
+                self.two_person_last_switch = None
+            else:
+                self.assigned_id = self.rng.choice(current_faces)
+                self.assigned_img_idx = self.rng.randint(0, self.n_images-1)
+                self.two_person_last_switch = cur_time
+
+        elif len(current_faces) == 2:
+            if self.two_person_last_switch is None:
+                self.two_person_last_switch = cur_time
+            elif cur_time - self.two_person_last_switch >= self.swap_interval:
+                other = [i for i in current_faces if i != self.assigned_id]
+                if other: self.assigned_id = other[0]
+                self.two_person_last_switch = cur_time
+
+    def process(self, frame, frame_ts):
+        """
+        検出・追跡・笑顔・割当・倍率更新までを行い、描画に必要な結果を返す。
+        frame_ts はフレーム取得時刻。結果に刻印して、描画側が同じフレームに重ねられるようにする。
+        """
+        self.clock.t = frame_ts
+        h, w = frame.shape[:2]
+
+        # 前フレームのランドマークが無ければ追跡できないので検出する
+        if not self.prev_landmarks_by_id:
+            self.keyframes.request()
+        is_keyframe = self.keyframes.next_is_keyframe()
+        track_centroids = list(self.ct.objects.values())
+        scale = min(inference_scale(w, h, *self.infer_size), inference_scale(w, h, 0, self.tier_height))
+        ctx = self.graph.begin(frame=frame, frame_size=(w, h), infer_scale=scale,
+                               is_keyframe=is_keyframe,
+                               prev_landmarks=self.prev_landmarks_by_id,
+                               track_centroids=track_centroids)
+        if self.remote is not None:
+            # 別プロセスのモデル結果をそのままステージ出力として置く（該当ステージは走らない）
+            outputs = self.remote.run(ctx["infer_frame"], (w, h), is_keyframe, track_centroids)
+            for name, value in outputs.items():
+                ctx.provide(name, value)
+
+        # トラッカー
+        track_boxes = ctx["track_boxes"]
+        with self.metrics.stage("tracking"):
+            objects = self.ct.update(track_boxes, frame_size=(w, h))
+
+        ctx.provide("objects", objects)
+
+        # FaceMesh → ランドマーク / 笑顔
+        batch, mesh_ids = ctx["face_mesh"], ctx["mesh_ids"]
+        landmarks_by_id, smile_by_id, base_size_by_id = {}, {}, {}
+        if len(batch):
+            # 登録済みの番号だけの (faces, K, 3)。笑顔スコアと鼻の基準サイズは一括計算
+            col = registered_index()[1]
+            smiles = compute_smile_scores(batch, col)
+            bases  = compute_nose_base_sizes(batch, col)
+            for f, pts in enumerate(split_faces(batch, col)):
+                if mesh_ids is not None:
+                    best_id = mesh_ids[f]   # 切り抜きがそのまま ID
+                else:
+                    nx, ny, _ = pts[NOSE_TIP]
+                    best_id, min_d = None, float("inf")
+                    for oid, (cx, cy) in objects.items():
+                        d = (nx-cx)**2 + (ny-cy)**2
+                        if d < min_d: min_d, best_id = d, oid
+                if best_id is not None:
+                    landmarks_by_id[best_id] = pts
+                    # ※ 笑顔スコアは nose_logic.py 側の実装を使用
+                    smile_by_id[best_id]     = float(smiles[f])
+                    base_size_by_id[best_id] = int(bases[f])
+
+        # トラック喪失（前フレームより顔が減った）や新規顔（生きているトラックより多い）なら次で検出
+        n_mesh = len(batch)
+        n_live = sum(1 for oid in objects if self.ct.disappeared.get(oid, 0) == 0)
+        if len(landmarks_by_id) < len(self.prev_landmarks_by_id) or n_mesh > n_live:
+            self.keyframes.request()
+        self.keyframes.observe_motion(
+            face_motion(self.prev_landmarks_by_id, landmarks_by_id, compute_nose_base_size))
+        self.prev_landmarks_by_id = landmarks_by_id
+
+        # 割当
+        cur_time = frame_ts
+        current_faces = list(landmarks_by_id.keys())
+        self._assign(current_faces, cur_time)
+
+        if self.reid is not None:
+            with self.metrics.stage("reid"):
+                self._reid_step(frame, objects, landmarks_by_id, cur_time)
+
+        # nose_logic で各人の倍率を更新
+        with self.metrics.stage("nose_logic"):
+            nose_scales = self.nose_logic.update(landmarks_by_id, smile_by_id)
+
+        if len(current_faces) == 2 and self.two_person_last_switch is not None:
+            remaining = max(0.0, self.swap_interval - (cur_time - self.two_person_last_switch))
+        else:
+            # 1人時の残りは未使用（nose_logic にAPIがあれば利用）
+            remaining = 0.0
+
+        # デバッグ表示用の文字列は表示する時だけ作る
+        debug_lines = None
+        if self.debug_overlay:
+            for name, value in (("current_faces", current_faces), ("remaining", remaining),
+                                ("landmarks_by_id", landmarks_by_id), ("smile_by_id", smile_by_id),
+                                ("nose_scales", nose_scales), ("assigned_id", self.assigned_id)):
+                ctx.provide(name, value)
+            debug_lines = ctx["debug_lines"]
+        self.graph.end(ctx)
+
+        return {
+            "ts":               frame_ts,
+            "objects":          dict(objects),
+            "landmarks_by_id":  landmarks_by_id,
+            "smile_by_id":      smile_by_id,
+            "base_size_by_id":  base_size_by_id,   # 鼻の基準サイズ px（compute_nose_base_size と同じ値）
+            "nose_scales":      nose_scales,
+            "current_faces":    current_faces,
+            "assigned_id":      self.assigned_id,
+            "assigned_img_idx": self.assigned_img_idx,
+            "remaining":        remaining,
+            "debug_lines":      debug_lines,
+        }
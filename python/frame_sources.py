@@ -0,0 +1,129 @@
+# frame_sources.py — カメラ・録画・連番画像・合成フレームを (ts, frame) の列として読む
+import os
+from glob import glob
+
+import cv2
+import numpy as np
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def try_open_camera(index: int):
+    cap = cv2.VideoCapture(index, cv2.CAP_DSHOW)
+    if not cap.isOpened():
+        print(f"Webカメラ {index} を開けませんでした。")
+        return None
+    # ドライバ側にフレームを溜めない（遅延対策。未対応のバックエンドでは無視される）
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+def camera_frames(index, metrics=None, stop_event=None):
+    """
+    カメラの最新フレーム。ts は取得時刻（monotonic）。
+    開けない・止まった時は CameraController が開き直すので、列は stop_event まで終わらない。
+    """
+    from frame_pipeline import CameraController, LatestSlot
+    slot = LatestSlot()
+    camera = CameraController(try_open_camera, index, slot, metrics=metrics).start()
+    try:
+        while stop_event is None or not stop_event.is_set():
+            pkt = slot.get(timeout=0.1)
+            if pkt is not None:
+                yield pkt.ts, pkt.image
+    finally:
+        camera.stop()
+
+
+def video_frames(path, fps=None):
+    """動画ファイル。ts はフレーム番号 / fps（fps 省略時はファイルの値、無ければ30）。"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"動画を開けませんでした: {path}")
+    fps = fps or cap.get(cv2.CAP_PROP_FPS) or 30.0
+    i = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield i / fps, frame
+            i += 1
+    finally:
+        cap.release()
+
+
+def image_dir_frames(path, fps=30.0):
+    """連番画像のディレクトリ（ファイル名順）。ts は番号 / fps。"""
+    files = sorted(f for f in glob(os.path.join(path, "*")) if f.lower().endswith(IMAGE_EXTS))
+    for i, f in enumerate(files):
+        frame = cv2.imread(f)
+        if frame is not None:
+            yield i / fps, frame
+
+
+def synthetic_frames(n_frames, fps=30.0, size=(1280, 720), face="assets/test-face.jpg", seed=0):
+    """
+    test-face.jpg を背景の上でゆっくり動かした合成フレーム（カメラ無しでの動作確認用）。
+    同じ seed なら同じ列になる。
+    """
+    w, h = size
+    src = cv2.imread(face)
+    if src is None:
+        raise IOError(f"画像を読めませんでした: {face}")
+    fh = int(h * 0.8); fw = int(src.shape[1] * fh / src.shape[0])
+    face_img = cv2.resize(src, (fw, fh), interpolation=cv2.INTER_AREA)
+    rng = np.random.default_rng(seed)
+    bg = np.full((h, w, 3), 40, dtype=np.uint8)
+    for i in range(n_frames):
+        frame = bg.copy()
+        cx = int(w / 2 + (w - fw) / 3 * np.sin(i / (fps * 4.0)))
+        cy = int(h / 2 + rng.normal(0, 1.5))
+        x0 = cx - fw // 2; y0 = cy - fh // 2
+        xs0, ys0 = max(0, x0), max(0, y0)
+        xs1, ys1 = min(w, x0 + fw), min(h, y0 + fh)
+        frame[ys0:ys1, xs0:xs1] = face_img[ys0 - y0:ys1 - y0, xs0 - x0:xs1 - x0]
+        yield i / fps, frame
+
+
+def crowd_frames(n_frames, n_faces, fps=30.0, size=(1280, 720), face="assets/test-face.jpg", seed=0):
+    """
+    test-face.jpg を n_faces 個、大きさ（画面の高さの 12〜35%）と位置を変えて重ねた合成フレーム（人数ごとの負荷測定用）。
+    顔は格子のセルに1つずつ置き、セルの中でゆっくり動かす（重なって1人に見えないように）。同じ seed なら同じ列になる。
+    """
+    w, h = size
+    src = cv2.imread(face)
+    if src is None:
+        raise IOError(f"画像を読めませんでした: {face}")
+    rng = np.random.default_rng(seed)
+    cols = max(1, int(np.ceil(np.sqrt(n_faces * w / h))))
+    rows = max(1, int(np.ceil(n_faces / cols)))
+    cw, ch = w // cols, h // rows
+    cells = rng.permutation(rows * cols)[:n_faces]
+    faces = []
+    for cell in cells:
+        r, c = divmod(int(cell), cols)
+        fh = int(min(ch * 0.9, h * rng.uniform(0.12, 0.35)))
+        fw = int(src.shape[1] * fh / src.shape[0])
+        if fw > cw * 0.9:
+            fw = int(cw * 0.9); fh = int(src.shape[0] * fw / src.shape[1])
+        img = cv2.resize(src, (fw, fh), interpolation=cv2.INTER_AREA)
+        slack = (cw - fw, ch - fh)   # セルの中で動ける幅
+        faces.append((img, c * cw, r * ch, slack, rng.uniform(0, 2 * np.pi), rng.uniform(2.0, 6.0)))
+    bg = np.full((h, w, 3), 40, dtype=np.uint8)
+    for i in range(n_frames):
+        frame = bg.copy()
+        t = i / fps
+        for img, x0, y0, (sx, sy), phase, period in faces:
+            fh, fw = img.shape[:2]
+            x = x0 + int(sx * (0.5 + 0.5 * np.sin(2 * np.pi * t / period + phase)))
+            y = y0 + int(sy * (0.5 + 0.5 * np.cos(2 * np.pi * t / period + phase)))
+            frame[y:y + fh, x:x + fw] = img
+        yield t, frame
+
+
+def open_source(src, fps=None):
+    """src がディレクトリなら連番画像、それ以外は動画として開く。"""
+    if os.path.isdir(src):
+        return image_dir_frames(src, fps or 30.0)
+    return video_frames(src, fps)
@@ -0,0 +1,86 @@
+# hog_fallback.py — 顔が取れない時の人物検出（HOG）を縮小＋ROI＋結果再利用で軽くする
+import cv2
+import numpy as np
+
+HOG_WIN_W, HOG_WIN_H = 64, 128   # デフォルト人物検出器の窓サイズ
+
+
+class FastHogDetector:
+    """
+    detect(frame_bgr, centroids) -> [(x, y, w, h), ...]（フル解像度の座標）
+      - ROI: 既知のトラック重心の周り（体は顔より下に伸びるので下端はフレーム下まで）。
+             重心が無ければフレーム全体。
+      - 縮小: ROI を downscale 倍して HOG を回す（窓より小さくなる場合は縮小を緩める）。
+      - 再利用: 前回結果から reuse_frames 回以内、かつ縮小グレー画像の平均差分が
+                motion_thresh 未満なら HOG を回さず前回結果を返す。
+    """
+    def __init__(self, hog, downscale=0.5, reuse_frames=5, motion_thresh=4.0,
+                 roi_half_w=0.2, roi_above=0.2,
+                 win_stride=(8, 8), padding=(16, 16), scale=1.05):
+        self.hog           = hog
+        self.downscale     = float(downscale)
+        self.reuse_frames  = int(reuse_frames)
+        self.motion_thresh = float(motion_thresh)
+        self.roi_half_w    = roi_half_w    # 重心から左右にフレーム幅の何割を見るか
+        self.roi_above     = roi_above     # 重心から上にフレーム高の何割を見るか
+        self.win_stride    = win_stride
+        self.padding       = padding
+        self.scale         = scale
+
+        self._last_rects = []
+        self._last_tiny  = None
+        self._age        = 0
+        self.runs        = 0   # 実際に HOG を回した回数
+        self.reused      = 0   # 前回結果を返した回数
+
+    def reset(self):
+        """前回結果の再利用に使う状態を捨てる（別の映像を続けて処理する時。runs/reused は数え続ける）。"""
+        self._last_rects = []
+        self._last_tiny  = None
+        self._age        = 0
+
+    def _roi(self, w, h, centroids):
+        if not centroids:
+            return 0, 0, w, h
+        xs = [int(c[0]) for c in centroids]; ys = [int(c[1]) for c in centroids]
+        dx = int(w * self.roi_half_w); dy = int(h * self.roi_above)
+        x0 = max(0, min(xs) - dx); x1 = min(w, max(xs) + dx)
+        y0 = max(0, min(ys) - dy); y1 = h
+        return x0, y0, x1, y1
+
+    def _motion(self, gray):
+        tiny = cv2.resize(gray, (64, 36), interpolation=cv2.INTER_AREA)
+        prev = self._last_tiny
+        self._last_tiny = tiny
+        if prev is None:
+            return True
+        return float(cv2.absdiff(tiny, prev).mean()) >= self.motion_thresh
+
+    def detect(self, frame_bgr, centroids=()):
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+        moved = self._motion(gray)
+        if not moved and self.runs > 0 and self._age < self.reuse_frames:
+            self._age += 1
+            self.reused += 1
+            return list(self._last_rects)
+
+        h, w = gray.shape[:2]
+        x0, y0, x1, y1 = self._roi(w, h, centroids)
+        roi = gray[y0:y1, x0:x1]
+        rw, rh = x1 - x0, y1 - y0
+        # 窓 (64x128) が入らない所まで縮めない
+        f = max(self.downscale, HOG_WIN_W / max(1, rw), HOG_WIN_H / max(1, rh))
+        rects = []
+        if f <= 1.0:
+            small = roi if f == 1.0 else cv2.resize(roi, (int(rw * f), int(rh * f)),
+                                                    interpolation=cv2.INTER_AREA)
+            found, _ = self.hog.detectMultiScale(small, winStride=self.win_stride,
+                                                 padding=self.padding, scale=self.scale)
+            inv = 1.0 / f
+            for x, y, bw, bh in np.asarray(found).reshape(-1, 4):
+                rects.append((int(x * inv) + x0, int(y * inv) + y0, int(bw * inv), int(bh * inv)))
+
+        self._last_rects = rects
+        self._age = 0
+        self.runs += 1
+        return list(rects)
@@ -0,0 +1,74 @@
+# idle.py — 誰もいない間は推論を止め、縮小グレー画像の差分だけで人が来たかを見る
+import cv2
+
+
+class IdleGate:
+    """
+    should_process(frame, now) -> True なら通常の推論を回す / False なら今のフレームは飛ばす
+    observe(has_faces, now)      -> 推論結果（顔がいたか）を渡す
+      - active: 顔が idle_after 秒続けて見つからなければ idle へ。
+      - idle:   poll_hz の間隔でだけ 64x36 のグレー画像の平均差分を見て、motion_thresh 以上なら
+                そのフレームから active に戻る（推論を再開）。
+      - idle_after <= 0 なら常に active。
+    状態ごとの滞在時間は seconds（{"active": 秒, "idle": 秒}）に貯める。時刻はフレームの時刻を使う。
+    """
+    def __init__(self, idle_after=10.0, poll_hz=5.0, motion_thresh=4.0, size=(64, 36)):
+        self.idle_after    = float(idle_after)
+        self.poll_interval = 1.0 / float(poll_hz) if poll_hz > 0 else 0.0
+        self.motion_thresh = float(motion_thresh)
+        self.size          = size
+        self.state         = "active"
+        self.seconds       = {"active": 0.0, "idle": 0.0}
+        self.transitions   = 0
+        self._since        = None    # 今の状態に入った時刻
+        self._last_face    = None
+        self._last_poll    = None
+        self._tiny         = None
+
+    @property
+    def idle(self):
+        return self.state == "idle"
+
+    def _switch(self, state, now):
+        self._account(now)
+        self.state = state
+        self.transitions += 1
+
+    def _account(self, now):
+        if self._since is not None:
+            self.seconds[self.state] += max(0.0, now - self._since)
+        self._since = now
+
+    def _moved(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        tiny = cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+        prev, self._tiny = self._tiny, tiny
+        return prev is not None and float(cv2.absdiff(tiny, prev).mean()) >= self.motion_thresh
+
+    def should_process(self, frame, now):
+        if self._since is None:
+            self._since = self._last_face = now
+        if not self.idle:
+            return True
+        if self._last_poll is not None and now - self._last_poll < self.poll_interval:
+            return False
+        self._last_poll = now
+        if self._moved(frame):
+            self._switch("active", now)
+            self._last_face = now   # 動いたら idle_after 秒は推論を続ける
+            return True
+        return False
+
+    def observe(self, has_faces, now):
+        if has_faces or self.idle_after <= 0:
+            self._last_face = now
+        elif now - self._last_face >= self.idle_after:
+            self._switch("idle", now)
+            self._last_poll = None
+            self._tiny = None   # 入った時のフレームを基準にする
+
+    def report(self, now=None):
+        """{"active": 秒, "idle": 秒}（now を渡すと今の状態の経過分も含める）。"""
+        if now is not None:
+            self._account(now)
+        return {k: round(v, 1) for k, v in self.seconds.items()}
@@ -0,0 +1,77 @@
+# keyframe.py — 検出（FaceDetection/Pose）を何フレームおきに回すかを決めるスケジューラ
+import math
+
+import numpy as np
+
+import landmarks
+
+# 追跡用ボックスに使う顔の輪郭の端（額・顎・左右の頬）
+BOX_LANDMARKS = (10, 152, 234, 454)
+landmarks.register(*BOX_LANDMARKS)
+
+
+class KeyframeScheduler:
+    """
+    キーフレームでだけ重い検出を回し、その間は前フレームの FaceMesh ランドマークから
+    追跡用ボックスを作る。検出間隔 N は顔の動き量で自動調整する。
+      - 動きが大きい（motion >= motion_hi）→ N を min_interval に戻す
+      - 動きが小さい（motion <  motion_lo）→ N を1ずつ伸ばす（max_interval まで）
+      - トラック喪失・新規顔・ランドマーク無しは request() で即キーフレーム
+    motion は「フレーム間の鼻の移動量 / 顔の大きさ」の最大値（解像度に依存しない）。
+    """
+    def __init__(self, min_interval=2, max_interval=10, motion_lo=0.03, motion_hi=0.15):
+        self.min_interval = max(1, int(min_interval))
+        self.max_interval = max(self.min_interval, int(max_interval))
+        self.motion_lo    = motion_lo
+        self.motion_hi    = motion_hi
+        self.interval     = self.min_interval
+        self._since       = 0       # 前回キーフレームからのフレーム数
+        self._forced      = True    # 起動直後は必ず検出
+        self.keyframes    = 0
+        self.frames       = 0
+
+    def request(self):
+        """次のフレームを強制的にキーフレームにする。"""
+        self._forced = True
+
+    def next_is_keyframe(self) -> bool:
+        self.frames += 1
+        if self._forced or self._since + 1 >= self.interval:
+            self._forced = False
+            self._since = 0
+            self.keyframes += 1
+            return True
+        self._since += 1
+        return False
+
+    def observe_motion(self, motion):
+        if motion is None:
+            return
+        if motion >= self.motion_hi:
+            self.interval = self.min_interval
+        elif motion < self.motion_lo:
+            self.interval = min(self.max_interval, self.interval + 1)
+
+
+def landmarks_box(pts):
+    """ランドマーク（[(x, y, z), ...] または FaceLandmarks）の外接矩形 (x, y, w, h)。"""
+    a = np.asarray(pts, dtype=np.float32)
+    x0, y0 = a[:, :2].min(axis=0)
+    x1, y1 = a[:, :2].max(axis=0)
+    return (int(x0), int(y0), int(x1 - x0), int(y1 - y0))
+
+
+def face_motion(prev_landmarks, cur_landmarks, size_fn):
+    """
+    同じIDの鼻(1番)の移動量を顔サイズで割った値の最大。共通IDが無ければ None。
+    size_fn(pts) は顔の大きさ（px）を返す関数。
+    """
+    best = None
+    for pid, pts in cur_landmarks.items():
+        prev = prev_landmarks.get(pid)
+        if prev is None:
+            continue
+        size = max(1.0, float(size_fn(pts)))
+        d = math.hypot(pts[1][0] - prev[1][0], pts[1][1] - prev[1][1]) / size
+        best = d if best is None else max(best, d)
+    return best
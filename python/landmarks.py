@@ -0,0 +1,75 @@
+# landmarks.py — FaceMesh ランドマークを NumPy 配列で扱う（使う番号だけ取り出す）
+import numpy as np
+
+# 利用側が register() で宣言したランドマーク番号（468点のうち実際に読む分だけ）
+_registered = set()
+_index_cache = None   # (indices ndarray, {番号: 列})
+
+
+def register(*indices):
+    """このランドマーク番号を読む、と宣言する（モジュール読み込み時に呼ぶ想定）。"""
+    global _index_cache
+    new = set(int(i) for i in indices) - _registered
+    if new:
+        _registered.update(new)
+        _index_cache = None
+
+
+def registered_index():
+    """(番号の配列, {番号: 列}) を返す。登録が変わらない限り同じものを使い回す。"""
+    global _index_cache
+    if _index_cache is None:
+        idx = np.array(sorted(_registered), dtype=np.intp)
+        _index_cache = (idx, {int(n): c for c, n in enumerate(idx)})
+    return _index_cache
+
+
+class FaceLandmarks:
+    """
+    1人分のランドマーク。中身は (K, 3) float32（x, y はピクセル、z はそのまま）。
+    pts[番号] で (x, y, z) の行が取れるので、従来の [(x, y, z), ...] と同じ書き方で読める。
+    登録されていない番号は IndexError（従来のフォールバック処理がそのまま効く）。
+    """
+    __slots__ = ("arr", "col")
+
+    def __init__(self, arr, col):
+        self.arr = arr
+        self.col = col
+
+    def __getitem__(self, i):
+        c = self.col.get(i)
+        if c is None:
+            raise IndexError(f"landmark {i} は登録されていません")
+        return self.arr[c]
+
+    def __len__(self):
+        return len(self.arr)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.arr if dtype is None else self.arr.astype(dtype)
+
+
+def extract_batch(multi_face_landmarks, w, h, indices=None):
+    """
+    MediaPipe の multi_face_landmarks から (faces, K, 3) float32 を作る。
+    indices を省略すると登録済みの番号だけを読む（468点すべては触らない）。
+    return: (batch, col)  col は {番号: 列}
+    """
+    if indices is None:
+        idx, col = registered_index()
+    else:
+        idx = np.asarray(indices, dtype=np.intp)
+        col = {int(n): c for c, n in enumerate(idx)}
+    faces = list(multi_face_landmarks or ())
+    batch = np.empty((len(faces), len(idx), 3), dtype=np.float32)
+    for f, face_lms in enumerate(faces):
+        lms = face_lms.landmark
+        batch[f] = [(lms[i].x, lms[i].y, lms[i].z) for i in idx]
+    batch[..., 0] *= w
+    batch[..., 1] *= h
+    return batch, col
+
+
+def split_faces(batch, col):
+    """(faces, K, 3) を1人ずつの FaceLandmarks（配列のビュー）に分ける。"""
+    return [FaceLandmarks(batch[f], col) for f in range(len(batch))]
@@ -0,0 +1,185 @@
+# metrics.py — ステージごとの処理時間（ns）をリングバッファに溜めて p50/p95/p99 を出す
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+def process_memory():
+    """
+    このプロセスの (RSS, ピークRSS) を MB で返す（ベンチ・長時間試験用）。取れない項目は None。
+    Linux は /proc、Windows は GetProcessMemoryInfo、それ以外はピークだけ resource から。
+    """
+    if sys.platform.startswith("linux"):
+        vals = {}
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, kb = line.split()[:2]
+                    vals[key] = int(kb) / 1024
+        return vals.get("VmRSS:"), vals.get("VmHWM:")
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PMC(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        pmc = PMC(); pmc.cb = ctypes.sizeof(PMC)
+        proc = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(proc, ctypes.byref(pmc), pmc.cb):
+            return pmc.WorkingSetSize / 2**20, pmc.PeakWorkingSetSize / 2**20
+        return None, None
+    try:
+        import resource
+        return None, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**20   # macOS はバイト
+    except ImportError:
+        return None, None
+
+
+class _NullTimer:
+    """計測オフ時に返す何もしないコンテキスト（確保なし）。"""
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NULL = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("_m", "_name", "_t0")
+
+    def __init__(self, metrics, name):
+        self._m = metrics
+        self._name = name
+        self._t0 = 0
+
+    def __enter__(self):
+        self._t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self._m.record(self._name, time.perf_counter_ns() - self._t0)
+        return False
+
+
+class _Ring:
+    __slots__ = ("buf", "i", "count")
+
+    def __init__(self, size):
+        self.buf = np.zeros(size, dtype=np.int64)
+        self.i = 0
+        self.count = 0   # 通算の記録回数
+
+
+class StageMetrics:
+    """
+    with metrics.stage("pose"): ... で処理時間を記録する。
+      - ステージごとに直近 window 件だけを固定長のリングバッファに持つ（増え続けない）
+      - enabled=False の時 stage() は共有の空コンテキストを返すだけ、record() は何もしない（ほぼゼロコスト）
+      - 1つのステージ名は1つのスレッドからだけ計測する前提（タイマーを使い回す）
+      - count() でイベント回数（再接続など）、set() で累計値（状態ごとの秒数など）も持てる
+        （カウンタは複数のスレッドから触るので _lock の下で更新し、読む時は counter_items() の写しを使う）
+    """
+    def __init__(self, enabled=True, window=512):
+        self.enabled  = enabled
+        self.window   = int(window)
+        self._rings   = {}
+        self._timers  = {}
+        self.counters = {}
+        self._lock    = threading.Lock()
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL
+        t = self._timers.get(name)
+        if t is None:
+            t = self._timers[name] = _Timer(self, name)
+        return t
+
+    def record(self, name, ns):
+        if not self.enabled:
+            return
+        r = self._rings.get(name)
+        if r is None:
+            with self._lock:
+                r = self._rings.setdefault(name, _Ring(self.window))
+        r.buf[r.i] = ns
+        r.i = (r.i + 1) % self.window
+        r.count += 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name, value):
+        """カウンタを値で上書きする（状態ごとの累計秒数など）。"""
+        with self._lock:
+            self.counters[name] = value
+
+    def counter_items(self):
+        """カウンタの写し [(名前, 値), ...]（ロックの下で作るので、他スレッドの更新中でも安全に回せる）。"""
+        with self._lock:
+            return list(self.counters.items())
+
+    def summary(self) -> dict:
+        """{stage: {"count", "p50_ms", "p95_ms", "p99_ms"}}"""
+        out = {}
+        for name, r in list(self._rings.items()):
+            n = min(r.count, self.window)
+            if n == 0:
+                continue
+            p50, p95, p99 = np.percentile(r.buf[:n], (50, 95, 99)) / 1e6
+            out[name] = {"count": r.count, "p50_ms": round(float(p50), 3),
+                         "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3)}
+        return out
+
+    def debug_lines(self):
+        """デバッグパネル用の文字列（ステージ名 p50/p95/p99 ms）。"""
+        lines = [f"{name:<10} {s['p50_ms']:6.2f} {s['p95_ms']:6.2f} {s['p99_ms']:6.2f}"
+                 for name, s in self.summary().items()]
+        lines += [f"{name}: {n}" for name, n in self.counter_items()]
+        return lines
+
+
+class MetricsExporter:
+    """
+    interval 秒ごとに StageMetrics.summary() をファイルへ追記する。
+    拡張子 .csv なら1ステージ1行の CSV、それ以外は1回1行の JSONL。
+    """
+    def __init__(self, metrics, path, interval=10.0):
+        self.metrics  = metrics
+        self.path     = path
+        self.interval = float(interval)
+        self._next    = time.monotonic() + self.interval
+        self._csv     = path.lower().endswith(".csv")
+        if self._csv and not os.path.exists(path):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("time,stage,count,p50_ms,p95_ms,p99_ms\n")
+
+    def maybe_flush(self, now=None):
+        now = time.monotonic() if now is None else now
+        if now < self._next:
+            return
+        self._next = now + self.interval
+        self.flush()
+
+    def flush(self):
+        summary = self.metrics.summary()
+        counters = self.metrics.counter_items()
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with open(self.path, "a", encoding="utf-8") as f:
+            if self._csv:
+                for name, s in summary.items():
+                    f.write(f"{stamp},{name},{s['count']},{s['p50_ms']},{s['p95_ms']},{s['p99_ms']}\n")
+                for name, n in counters:
+                    f.write(f"{stamp},{name},{n},,,\n")
+            else:
+                f.write(json.dumps({"time": stamp, "stages": summary,
+                                    "counters": dict(counters)}) + "\n")
@@ -0,0 +1,398 @@
+# model_workers.py — FaceMesh / 顔検出+Pose / HOG を別プロセスで回す（フレームは共有メモリで渡す）
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait as wait_conns
+
+import numpy as np
+
+from frame_processor import scale_rects
+
+READY = -1   # ワーカー起動完了の通知に使う seq
+
+
+class SharedFrameRing:
+    """
+    slots 枚の BGR フレームと各スロットの seq を1つの shared_memory に置くリング。
+      - 書き込み側（メインプロセス）は write(seq, frame) でスロット seq % slots に上書きする。
+        書き込み中はスロットの seq を -1 にしておく。
+      - 読み込み側（ワーカー）は view(slot) をそのまま使い、読み終えてから seq(slot) が
+        変わっていないかを確かめる（変わっていれば途中で上書きされたので結果は捨てる）。
+    フレームは pickle されず、プロセス間で受け渡すのは (seq, slot) だけ。
+    """
+    def __init__(self, shape, slots=4, name=None):
+        self.shape  = tuple(int(v) for v in shape)
+        self.slots  = int(slots)
+        create      = name is None
+        frame_bytes = int(np.prod(self.shape))
+        self.shm    = shared_memory.SharedMemory(
+            name=name, create=create, size=8*self.slots + frame_bytes*self.slots if create else 0)
+        self._seqs   = np.ndarray((self.slots,), dtype=np.int64, buffer=self.shm.buf)
+        self._frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8,
+                                  buffer=self.shm.buf, offset=8*self.slots)
+        if create:
+            self._seqs[:] = -1
+
+    @property
+    def info(self):
+        """attach 用の (name, shape, slots)。"""
+        return self.shm.name, self.shape, self.slots
+
+    @classmethod
+    def attach(cls, info):
+        name, shape, slots = info
+        return cls(shape, slots, name=name)
+
+    def write(self, seq, frame):
+        slot = seq % self.slots
+        self._seqs[slot] = -1
+        np.copyto(self._frames[slot], frame)
+        self._seqs[slot] = seq
+        return slot
+
+    def view(self, slot):
+        return self._frames[slot]
+
+    def seq(self, slot):
+        return int(self._seqs[slot])
+
+    def close(self, unlink=False):
+        # 共有メモリを指す配列を先に手放さないと close できない
+        self._seqs = self._frames = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+# ──────────────────────────────────────────────
+# ワーカー側
+# ──────────────────────────────────────────────
+def _make_runner(kind, cfg, indices):
+    """
+    kind ごとに run(frame_bgr, extra) -> 小さい結果 を返す関数を作る。
+    run.reset() で前のフレームを引き継ぐ状態（MediaPipe の追跡・HOG の再利用）を捨てる。
+    """
+    import cv2
+    from frame_processor import (create_face_mesh, create_face_detection, create_pose_model,
+                                 create_hog_fallback, face_boxes_from, pose_bbox_from)
+    from landmarks import extract_batch
+
+    # extra: face_mesh/detect は表示側の (w, h)（座標を表示側で返す）、hog は (重心, 縮小率)
+    if kind == "face_mesh":
+        fm = create_face_mesh(int(cfg.get("max_faces", 6)))
+        def run(frame, extra):
+            w, h = extra
+            res = fm.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            return extract_batch(res.multi_face_landmarks, w, h, indices)[0]
+        run.reset = fm.reset
+        return run
+
+    if kind == "detect":
+        fd = create_face_detection()
+        pose = [None]   # 顔が取れない時だけ使うので遅延生成
+        def run(frame, extra):
+            w, h = extra
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            boxes = face_boxes_from(fd.process(rgb), w, h)
+            if boxes:
+                return boxes, None
+            if pose[0] is None:
+                pose[0] = create_pose_model(int(cfg.get("pose_complexity", 1)))
+            return boxes, pose_bbox_from(pose[0].process(rgb), w, h)
+        def reset():
+            fd.reset()
+            if pose[0] is not None:
+                pose[0].reset()
+        run.reset = reset
+        return run
+
+    if kind == "hog":
+        hog = create_hog_fallback(cfg)
+        def run(frame, extra):
+            centroids, hog.downscale = extra
+            return hog.detect(frame, centroids)
+        run.reset = hog.reset
+        return run
+
+    raise ValueError(f"unknown worker kind: {kind}")
+
+
+def _worker_main(kind, cfg, indices, ring_info, task_q, result_conn):
+    """
+    ワーカープロセス本体。task_q から ("frame", seq, slot, extra) / ("ring", info) /
+    ("quality", {設定}) / ("reset",) / None を受ける。
+    溜まったフレームは最新の1件だけを処理し、(kind, seq, payload, 処理ns) を result_conn
+    （このワーカー専用のパイプ）に返す。
+    """
+    import cv2
+    cv2.setNumThreads(1)   # コアはプロセスで分ける（スレッドの取り合いを避ける）
+    run  = _make_runner(kind, cfg, indices)
+    ring = SharedFrameRing.attach(ring_info)
+    result_conn.send((kind, READY, None, 0))
+    try:
+        while True:
+            msgs = [task_q.get()]
+            while True:
+                try: msgs.append(task_q.get_nowait())
+                except queue.Empty: break
+            task = None
+            for msg in msgs:
+                if msg is None:
+                    return
+                if msg[0] == "ring":
+                    # フレームサイズが変わった。古いリングのタスクは捨てる
+                    ring.close()
+                    ring = SharedFrameRing.attach(msg[1])
+                    task = None
+                elif msg[0] == "quality":
+                    # 品質の段階が変わった。モデルを作り直す
+                    cfg = {**cfg, **msg[1]}
+                    run = _make_runner(kind, cfg, indices)
+                elif msg[0] == "reset":
+                    # 別の映像に切り替わった。それより前のフレームは捨て、追跡の状態を切る
+                    run.reset()
+                    task = None
+                else:
+                    task = msg
+            if task is None:
+                continue
+
+            _, seq, slot, extra = task
+            t0 = time.perf_counter_ns()
+            payload = None
+            if ring.seq(slot) == seq:
+                try:
+                    payload = run(ring.view(slot), extra)
+                except Exception as e:
+                    print(f"[{kind}] worker error: {e!r}")
+                # 処理中に上書きされていたら結果は使わない
+                if ring.seq(slot) != seq:
+                    payload = None
+            result_conn.send((kind, seq, payload, time.perf_counter_ns() - t0))
+    finally:
+        ring.close()
+        result_conn.close()
+
+
+# ──────────────────────────────────────────────
+# メインプロセス側
+# ──────────────────────────────────────────────
+class _Worker:
+    __slots__ = ("kind", "proc", "task_q", "conn", "ready", "backoff", "next_start")
+
+    def __init__(self, kind):
+        self.kind       = kind
+        self.proc       = None
+        self.task_q     = None
+        self.conn       = None   # 結果を読む側のパイプ（ワーカーごと。起動のたびに作り直す）
+        self.ready      = False
+        self.backoff    = 0.5    # 再起動の待ち（落ち続けるたびに倍、最大 8 秒）
+        self.next_start = 0.0
+
+
+class ModelWorkerPool:
+    """
+    run(infer_frame, frame_size, is_keyframe, track_centroids) -> {ステージ出力名: 値}
+      - 推論解像度のフレームを SharedFrameRing に書き、FaceMesh は毎フレーム、顔検出+Pose と HOG は
+        キーフレームだけ、それぞれのワーカーに (seq, slot) を送って並列に回す。
+        座標は表示側（frame_size）で返る。
+      - 結果は seq で突き合わせる。古い seq の結果は捨て、timeout 秒で来なかった分
+        （ワーカーが落ちた場合を含む）は「検出なし」として返すので、表示は止まらない。
+      - 結果はワーカーごとのパイプで受ける（書き手は1プロセスだけなので、落ちたワーカーが
+        ロックを握ったまま他のワーカーの結果を止めることはない）。落ちたワーカーのパイプは
+        EOF になるので、そのフレームではもう待たない。
+      - 落ちたワーカーは次の run() で作り直す（連続で落ちる時は間隔を空ける）。
+        再起動回数は metrics の "worker_restart" に数える。
+    HOG はキーフレームごとに顔検出と同時に回す（顔が取れたら結果は使われない）。
+    """
+    KINDS = ("face_mesh", "detect", "hog")
+    # 処理時間を記録する metrics のステージ名
+    STAGE_NAMES = {"face_mesh": "face_mesh", "detect": "face_det", "hog": "hog"}
+
+    def __init__(self, cfg, metrics=None, slots=4, timeout=0.5):
+        from landmarks import registered_index
+        from metrics import StageMetrics
+        self.cfg      = {k: v for k, v in cfg.items() if isinstance(v, (int, float, str))}
+        self.metrics  = metrics or StageMetrics(enabled=False)
+        self.slots    = int(slots)
+        self.timeout  = float(timeout)
+        self.hog_downscale = float(cfg.get("hog_downscale", 0.5))
+        self.allow_hog = True
+        self._indices = registered_index()[0]
+        self._ctx     = mp.get_context("spawn")   # Windows と同じ起動方式に揃える
+        self._workers = {k: _Worker(k) for k in self.KINDS}
+        self._ring    = None
+        self._seq     = 0
+        self.timeouts = 0   # 結果が間に合わなかった回数
+
+    # ---- ワーカー管理 ----
+    def _spawn(self, w):
+        if w.conn is not None:
+            w.conn.close()
+        w.conn, writer = self._ctx.Pipe(duplex=False)
+        w.task_q = self._ctx.Queue()
+        w.ready  = False
+        w.proc   = self._ctx.Process(
+            target=_worker_main, name=f"model-{w.kind}", daemon=True,
+            args=(w.kind, self.cfg, self._indices, self._ring.info, w.task_q, writer))
+        w.proc.start()
+        writer.close()   # 書き手はワーカーだけにする（落ちたら読む側が EOF になる）
+
+    def _supervise(self):
+        now = time.monotonic()
+        for w in self._workers.values():
+            if w.proc is not None and w.proc.is_alive():
+                continue
+            if now < w.next_start:
+                continue
+            if w.proc is not None:
+                print(f"[{w.kind}] worker exited (code {w.proc.exitcode}); restarting")
+                self.metrics.count("worker_restart")
+                w.next_start = now + w.backoff
+                w.backoff = min(8.0, w.backoff * 2)
+            self._spawn(w)
+
+    def start(self, shape=(720, 1280, 3)):
+        self._ring = SharedFrameRing(shape, self.slots)
+        self._supervise()
+
+    def wait_ready(self, timeout=60.0):
+        """
+        全ワーカーのモデル生成が終わるまで待つ（起動時のウォームアップ用）。
+        準備前に落ちたワーカーがあれば False を返す（以降も run() のたびに作り直しを試みる）。
+        """
+        if self._ring is None:
+            self.start()
+        deadline = time.monotonic() + timeout
+        while not all(w.ready for w in self._workers.values()):
+            if time.monotonic() >= deadline:
+                return False
+            self._drain(0, block_until=min(deadline, time.monotonic() + 0.1))
+            if any(not w.ready and w.conn is None for w in self._workers.values()):
+                return False
+        return True
+
+    def set_quality(self, pose_complexity, max_faces, allow_hog):
+        """品質の段階を反映（HOG は送らなくなるだけ。Pose/FaceMesh はワーカー側で作り直す）。"""
+        self.allow_hog = allow_hog
+        q = {"pose_complexity": int(pose_complexity), "max_faces": int(max_faces)}
+        if all(self.cfg.get(k) == v for k, v in q.items()):
+            return
+        self.cfg.update(q)   # 再起動したワーカーにも効くように
+        for kind in ("face_mesh", "detect"):
+            w = self._workers[kind]
+            if w.proc is not None and w.proc.is_alive():
+                w.task_q.put(("quality", q))
+
+    def reset(self):
+        """各ワーカーのモデルの追跡状態を捨てる（FrameProcessor.reset から。起動中のワーカーは元から空）。"""
+        for w in self._workers.values():
+            if w.proc is not None and w.proc.is_alive():
+                w.task_q.put(("reset",))
+
+    def close(self):
+        for w in self._workers.values():
+            if w.proc is not None and w.proc.is_alive():
+                w.task_q.put(None)
+        for w in self._workers.values():
+            if w.proc is not None:
+                w.proc.join(timeout=2.0)
+                if w.proc.is_alive():
+                    w.proc.terminate()
+            if w.conn is not None:
+                w.conn.close()
+                w.conn = None
+        if self._ring is not None:
+            self._ring.close(unlink=True)
+            self._ring = None
+
+    # ---- 結果の受け取り ----
+    def _drain(self, seq, block_until, got=None, want=()):
+        """
+        各ワーカーのパイプを読む。seq の結果を got に入れ、want が揃うか block_until を過ぎたら戻る。
+        落ちたワーカー（パイプが EOF）の分は待たない。
+        """
+        pending = set(want) - set(got or ())
+        while True:
+            remaining = block_until - time.monotonic()
+            conns = {w.conn: w for w in self._workers.values() if w.conn is not None}
+            ready = wait_conns(list(conns), timeout=max(0.0, min(remaining, 0.05))) if conns else []
+            for conn in ready:
+                w = conns[conn]
+                try:
+                    kind, r_seq, payload, ns = conn.recv()
+                except (EOFError, OSError):
+                    # ワーカーが落ちた。次の _supervise で作り直す
+                    conn.close()
+                    w.conn = None
+                    pending.discard(w.kind)
+                    continue
+                if r_seq == READY:
+                    w.ready = True
+                    continue
+                w.backoff = 0.5
+                if got is not None and r_seq == seq:
+                    self.metrics.record(self.STAGE_NAMES[kind], ns)
+                    got[kind] = payload
+                    pending.discard(kind)
+                # 古い seq の結果は捨てる
+            if got is not None:
+                pending = {k for k in pending
+                           if self._workers[k].conn is not None and self._workers[k].proc.is_alive()}
+                if not pending:
+                    return   # 揃った or 残りのワーカーが全部落ちている
+            if not ready and remaining <= 0:
+                return
+
+    # ---- 1フレーム ----
+    def run(self, frame, frame_size, is_keyframe, track_centroids=()):
+        if self._ring is None:
+            self.start(frame.shape)
+        elif frame.shape != self._ring.shape:
+            # 解像度が変わった（カメラ切り替え）。リングを作り直してワーカーに知らせる
+            old = self._ring
+            self._ring = SharedFrameRing(frame.shape, self.slots)
+            for w in self._workers.values():
+                if w.proc is not None and w.proc.is_alive():
+                    w.task_q.put(("ring", self._ring.info))
+            old.close(unlink=True)
+        self._supervise()
+        self._drain(None, block_until=0)   # 起動完了の通知と古い結果を片付ける
+
+        seq = self._seq; self._seq += 1
+        slot = self._ring.write(seq, frame)
+        want = ("face_mesh",)
+        if is_keyframe:
+            want += ("detect", "hog") if self.allow_hog else ("detect",)
+        scale = frame.shape[1] / frame_size[0]   # 表示座標 → 推論座標
+        extras = {"face_mesh": tuple(frame_size), "detect": tuple(frame_size),
+                  "hog": ([(float(cx)*scale, float(cy)*scale) for cx, cy in track_centroids],
+                          min(1.0, self.hog_downscale / scale))}
+        sent = []
+        for kind in want:
+            w = self._workers[kind]
+            # 起動中（モデル生成中）・落ちたワーカーには送らない
+            if w.ready and w.conn is not None and w.proc.is_alive():
+                w.task_q.put(("frame", seq, slot, extras[kind]))
+                sent.append(kind)
+
+        got = {}
+        if sent:
+            with self.metrics.stage("worker_wait"):
+                self._drain(seq, time.monotonic() + self.timeout, got, sent)
+        if any(got.get(k) is None for k in want):
+            self.timeouts += 1
+
+        # ステージ出力に変換（来なかった分は検出なし）
+        batch = got.get("face_mesh")
+        out = {"face_mesh": batch if batch is not None
+               else np.empty((0, len(self._indices), 3), dtype=np.float32),
+               "mesh_ids": None}   # 全体で回すので ID は main 側で対応付ける
+        if is_keyframe:
+            boxes, pose_bbox = got.get("detect") or ([], None)
+            out["face_boxes"] = boxes
+            if not boxes:
+                out["pose_bbox"] = pose_bbox
+            out["hog_rects"] = scale_rects(got.get("hog") or [], 1.0 / scale)
+        return out
@@ -2,6 +2,10 @@
 import time
 import math
 
+import numpy as np
+
+import landmarks
+
 # ---- スケール設定 ----
 SCALE_MIN_BASE   = 2.0   # 最低倍率（初期）
 HARD_MAX_SCALE   = 3.8   # ★最終上限（大きすぎるなら 3.6 などへ）
@@ -27,6 +31,13 @@ DECAY_PER_SEC    = 0.60  # ★笑っていない間の減衰係数（上げる
 # ---- キャリブレーション ----
 CALIB_SECS       = 2.0   # ★各人が見え始めてからこの秒数は絶対に増やさない
 
+# ---- 参照するランドマーク番号（landmarks.register で宣言）----
+SMILE_LANDMARKS  = (61, 291, 13, 14)     # 口角 左/右, 上唇/下唇
+SIZE_LANDMARKS   = (33, 263)             # 目の外側 左/右
+SIZE_FALLBACK    = (234, 454)            # 頬の外側 左/右
+NOSE_TIP         = 1                     # 鼻先（オーバーレイ位置）
+landmarks.register(NOSE_TIP, *SMILE_LANDMARKS, *SIZE_LANDMARKS, *SIZE_FALLBACK)
+
 def _clamp(x, lo, hi):
     return lo if x < lo else hi if x > hi else x
 
@@ -59,6 +70,30 @@ def compute_nose_base_size(pts):
             return 120
     return max(40, int(math.hypot(xR - xL, yR - yL) * 0.45))
 
+def compute_smile_scores(batch, col=None):
+    """
+    compute_smile_score の一括版。batch は (faces, K, 3)、col は {ランドマーク番号: 列}
+    （省略時は 468 点そのまま＝番号がそのまま列）。return: (faces,) float
+    """
+    c = col or {i: i for i in SMILE_LANDMARKS}
+    xy = batch[..., :2].astype(np.float64)
+    mouth_w = np.hypot(*(xy[:, c[291]] - xy[:, c[61]]).T)
+    mouth_h = np.hypot(*(xy[:, c[14]] - xy[:, c[13]]).T)
+    ok = (mouth_w > 1e-6) & (mouth_h > 1e-6)
+    ratio = np.divide(mouth_w, mouth_h, out=np.zeros_like(mouth_w), where=ok)
+    return np.where(ok, np.clip((ratio - 1.8) / 3.5, 0.0, 1.0), 0.0)
+
+def compute_nose_base_sizes(batch, col=None):
+    """compute_nose_base_size の一括版。目(33,263)が無ければ頬(234,454)。return: (faces,) int"""
+    c = col or {i: i for i in SIZE_LANDMARKS}
+    pair = SIZE_LANDMARKS if all(i in c for i in SIZE_LANDMARKS) else SIZE_FALLBACK
+    if not all(i in c for i in pair):
+        return np.full(len(batch), 120, dtype=int)
+    # 差は batch の型のまま取る（1人ずつ版と同じ丸めにする）
+    diff = (batch[:, c[pair[1]], :2] - batch[:, c[pair[0]], :2]).astype(np.float64)
+    d = np.hypot(diff[:, 0], diff[:, 1])
+    return np.maximum(40, (d * 0.45).astype(int))
+
 class NoseLogic:
     """
     update(landmarks_by_id, smile_by_id) -> {id: scale}
@@ -66,8 +101,13 @@ class NoseLogic:
       - 候補ON（絶対/相対）かつ MIN_ON_FRAMES 連続で本ONになり加算
       - ★ON中でも候補ONでなくなった瞬間から減衰（無表情で確実に小さくなる）
       - 倍率は [SCALE_MIN_BASE, HARD_MAX_SCALE] にクランプ
+      - 顔ぶれが変わったら、出入りした人の状態だけを初期化する
+        （legacy_reset=True なら従来どおり残った人の EMA/ON 状態も初期化する）
+    clock: 現在時刻(秒)を返す関数。省略時は time.monotonic（録画再生ではフレーム時刻を渡す）
     """
-    def __init__(self):
+    def __init__(self, legacy_reset=False, clock=None):
+        self._clock     = clock or time.monotonic
+        self.legacy_reset = legacy_reset
         self.scales     = {}   # id -> 現在倍率
         self.smile_ema  = {}   # id -> 平滑後スコア
         self.baseline   = {}   # id -> 中立EMA（笑っていない時のみ更新）
@@ -77,21 +117,60 @@ class NoseLogic:
         self.first_ts   = {}   # id -> 観測開始時刻
         self.last_ts    = {}   # id -> 前回更新時刻
         self.ids_live   = set()
+        self._restore   = {}   # id -> 次に現れた時に戻す状態（import_person）
+
+    def _now(self): return self._clock()
+
+    def export_person(self, pid):
+        """pid の状態（見失う前に reid.ReIdCache へ預ける用）。居なければ None。"""
+        if pid not in self.ids_live:
+            return None
+        return {"scale": self.scales[pid], "smile_ema": self.smile_ema[pid],
+                "baseline": self.baseline[pid], "noise_ema": self.noise_ema[pid],
+                "on_frames": self.on_frames[pid], "is_on": self.is_on[pid],
+                "first_ts": self.first_ts[pid], "last_ts": self.last_ts[pid]}
 
-    def _now(self): return time.monotonic()
+    def import_person(self, pid, state):
+        """pid が次の update で現れた時、初期化の代わりに state から続ける（キャリブ済みのまま）。"""
+        self._restore[pid] = state
+
+    def _apply_restore(self, now):
+        for pid, st in self._restore.items():
+            if pid not in self.ids_live:
+                continue
+            # 居なかった間の分だけ減衰させてから続ける
+            self.scales[pid]    = max(SCALE_MIN_BASE, st["scale"] - DECAY_PER_SEC * max(0.0, now - st["last_ts"]))
+            self.smile_ema[pid] = st["smile_ema"]
+            self.baseline[pid]  = st["baseline"]
+            self.noise_ema[pid] = st["noise_ema"]
+            self.on_frames[pid] = st["on_frames"]
+            self.is_on[pid]     = st["is_on"]
+            self.first_ts[pid]  = st["first_ts"]
+            self.last_ts[pid]   = now
+        self._restore.clear()
 
     def _reset_people(self, ids_now):
-        if ids_now != self.ids_live:
-            now = self._now()
-            self.scales    = {pid: self.scales.get(pid, SCALE_MIN_BASE) for pid in ids_now}
-            self.smile_ema = {pid: 0.0 for pid in ids_now}
-            self.baseline  = {pid: 0.0 for pid in ids_now}
-            self.noise_ema = {pid: 0.0 for pid in ids_now}
-            self.on_frames = {pid: 0   for pid in ids_now}
-            self.is_on     = {pid: False for pid in ids_now}
-            self.first_ts  = {pid: self.first_ts.get(pid, now) for pid in ids_now}
-            self.last_ts   = {pid: now for pid in ids_now}
-            self.ids_live  = set(ids_now)
+        if ids_now == self.ids_live:
+            return
+        now = self._now()
+        state = (self.scales, self.smile_ema, self.baseline, self.noise_ema,
+                 self.on_frames, self.is_on, self.first_ts, self.last_ts)
+        for pid in self.ids_live - ids_now:
+            for d in state:
+                d.pop(pid, None)
+        joined = ids_now - self.ids_live
+        for pid in joined:
+            self.scales[pid]   = SCALE_MIN_BASE
+            self.first_ts[pid] = now
+        for pid in (ids_now if self.legacy_reset else joined):
+            self.smile_ema[pid] = 0.0
+            self.baseline[pid]  = 0.0
+            self.noise_ema[pid] = 0.0
+            self.on_frames[pid] = 0
+            self.is_on[pid]     = False
+            self.last_ts[pid]   = now
+        self.ids_live = set(ids_now)
+        self._apply_restore(now)
 
     def _candidate_on(self, pid, s, base, sigma):
         # 絶対＆相対（中立+ノイズ×係数）を両方満たしたら候補ON
@@ -178,3 +257,157 @@ class NoseLogic:
             out[pid] = new_scale
 
         return out
+
+
+class VectorNoseLogic:
+    """
+    NoseLogic と同じ update(landmarks_by_id, smile_by_id) -> {id: scale} を、
+    人ごとの状態を NumPy 配列（スロット）に持って全員まとめて計算する版。
+      - id -> スロット番号の対応を持ち、出入りしたらその人のスロットだけ確保/解放する
+      - legacy_reset は NoseLogic と同じ（False: 新しく来た人のスロットだけ初期化、
+        True: 顔ぶれが変わったら全員の EMA/ON 状態を初期化）。どちらでも NoseLogic と完全に同じ出力。
+    """
+    def __init__(self, legacy_reset=False, capacity=8, clock=None):
+        self._clock       = clock or time.monotonic
+        self.legacy_reset = legacy_reset
+        self.slot_of   = {}          # id -> スロット
+        self._free     = []          # 空きスロット（小さい順に使う）
+        self._alloc(capacity)
+        self.ids_live  = set()
+        self._restore  = {}          # id -> 次に現れた時に戻す状態（import_person）
+
+    def _now(self): return self._clock()
+
+    def export_person(self, pid):
+        """NoseLogic.export_person と同じ形の dict。居なければ None。"""
+        k = self.slot_of.get(pid)
+        if k is None:
+            return None
+        return {"scale": float(self.scales[k]), "smile_ema": float(self.smile_ema[k]),
+                "baseline": float(self.baseline[k]), "noise_ema": float(self.noise_ema[k]),
+                "on_frames": int(self.on_frames[k]), "is_on": bool(self.is_on[k]),
+                "first_ts": float(self.first_ts[k]), "last_ts": float(self.last_ts[k])}
+
+    def import_person(self, pid, state):
+        self._restore[pid] = state
+
+    def _apply_restore(self, now):
+        for pid, st in self._restore.items():
+            k = self.slot_of.get(pid)
+            if k is None:
+                continue
+            self.scales[k]    = max(SCALE_MIN_BASE, st["scale"] - DECAY_PER_SEC * max(0.0, now - st["last_ts"]))
+            self.smile_ema[k] = st["smile_ema"]
+            self.baseline[k]  = st["baseline"]
+            self.noise_ema[k] = st["noise_ema"]
+            self.on_frames[k] = st["on_frames"]
+            self.is_on[k]     = st["is_on"]
+            self.first_ts[k]  = st["first_ts"]
+            self.last_ts[k]   = now
+        self._restore.clear()
+
+    def _alloc(self, n):
+        old = getattr(self, "scales", None)
+        m = 0 if old is None else len(old)
+        def grow(a, fill, dtype):
+            b = np.full(n, fill, dtype=dtype)
+            if a is not None: b[:m] = a
+            return b
+        self.scales    = grow(old, SCALE_MIN_BASE, np.float64)
+        self.smile_ema = grow(getattr(self, "smile_ema", None), 0.0, np.float64)
+        self.baseline  = grow(getattr(self, "baseline", None), 0.0, np.float64)
+        self.noise_ema = grow(getattr(self, "noise_ema", None), 0.0, np.float64)
+        self.on_frames = grow(getattr(self, "on_frames", None), 0, np.int64)
+        self.is_on     = grow(getattr(self, "is_on", None), False, bool)
+        self.first_ts  = grow(getattr(self, "first_ts", None), 0.0, np.float64)
+        self.last_ts   = grow(getattr(self, "last_ts", None), 0.0, np.float64)
+        self._free.extend(range(m, n))
+        self._free.sort()
+
+    def _init_slot(self, k, now):
+        self.scales[k]    = SCALE_MIN_BASE
+        self.first_ts[k]  = now
+        self._clear_slot(k, now)
+
+    def _clear_slot(self, k, now):
+        self.smile_ema[k] = 0.0
+        self.baseline[k]  = 0.0
+        self.noise_ema[k] = 0.0
+        self.on_frames[k] = 0
+        self.is_on[k]     = False
+        self.last_ts[k]   = now
+
+    def _reset_people(self, ids_now):
+        if ids_now == self.ids_live:
+            return
+        now = self._now()
+        for pid in self.ids_live - ids_now:
+            self._free.append(self.slot_of.pop(pid))
+        self._free.sort()
+        for pid in ids_now - self.ids_live:
+            if not self._free:
+                self._alloc(2 * len(self.scales))
+            k = self._free.pop(0)
+            self.slot_of[pid] = k
+            self._init_slot(k, now)
+        if self.legacy_reset and self.slot_of:
+            self._clear_slot(np.fromiter(self.slot_of.values(), dtype=np.intp), now)
+        self.ids_live = set(ids_now)
+        self._apply_restore(now)
+
+    def update(self, landmarks_by_id: dict, smile_by_id: dict) -> dict:
+        ids = list(landmarks_by_id.keys())
+        self._reset_people(set(ids))
+        if not ids:
+            return {}
+
+        now = self._now()
+        k = np.fromiter((self.slot_of[pid] for pid in ids), dtype=np.intp, count=len(ids))
+        s_raw = np.fromiter((float(smile_by_id.get(pid, 0.0)) for pid in ids),
+                            dtype=np.float64, count=len(ids))
+
+        # 経過時間
+        dt = np.maximum(1/120.0, now - self.last_ts[k])
+        self.last_ts[k] = now
+
+        # スコアEMA
+        s = self.smile_ema[k] * (1.0 - S_EMA_ALPHA) + s_raw * S_EMA_ALPHA
+        self.smile_ema[k] = s
+
+        in_calib = (now - self.first_ts[k]) < CALIB_SECS
+
+        # 中立＆ノイズEMA（本ONでない人だけ更新）
+        was_on = self.is_on[k]
+        learn = ~was_on
+        base = np.where(learn, self.baseline[k] * (1.0 - BASELINE_ALPHA) + s * BASELINE_ALPHA,
+                        self.baseline[k])
+        self.baseline[k] = base
+        sigma = np.where(learn, self.noise_ema[k] * (1.0 - NOISE_ALPHA) + np.abs(s - base) * NOISE_ALPHA,
+                         self.noise_ema[k])
+        self.noise_ema[k] = sigma
+
+        # 候補ON/OFF判定
+        thr_rel_on  = base + np.maximum(DELTA_ON,  K_SIGMA_ON  * sigma)
+        thr_rel_off = base + np.maximum(DELTA_OFF, K_SIGMA_OFF * sigma)
+        cand_on  = (s >= SMILE_ON_THRESH) & (s >= thr_rel_on)
+        cand_off = (s < SMILE_OFF_THRESH) | (s < thr_rel_off)
+
+        # ヒステリシス
+        on_frames = self.on_frames[k]
+        turn_off = was_on & cand_off
+        counting = learn & cand_on
+        on_frames = np.where(counting, on_frames + 1, np.where(learn | turn_off, 0, on_frames))
+        turn_on = counting & (on_frames >= MIN_ON_FRAMES) & ~in_calib
+        on_frames = np.where(turn_on, 0, on_frames)
+        is_on = (was_on & ~turn_off) | turn_on
+        self.on_frames[k] = on_frames
+        self.is_on[k] = is_on
+
+        # スケール更新（ON中でも候補ONでない間は減衰）
+        prev_scale = self.scales[k]
+        grow = prev_scale + np.maximum(0.0, s - thr_rel_on) * ADD_PER_SEC_K * dt
+        decay = prev_scale - DECAY_PER_SEC * dt
+        new_scale = np.clip(np.where(is_on & cand_on, grow, decay), SCALE_MIN_BASE, HARD_MAX_SCALE)
+        self.scales[k] = new_scale
+
+        return dict(zip(ids, new_scale.tolist()))
@@ -0,0 +1,426 @@
+# pipeline.py — Nose Mirror 本体（カメラ・UI・音・推論・描画を1つのクラスにまとめる）
+import json
+import threading
+import time
+from glob import glob
+
+import cv2
+import numpy as np
+
+from app_config import load_saved_config, save_config
+from settings_ui import SettingsUI
+from nose_logic import NOSE_TIP
+from utils import overlay_image_premul
+from frame_pipeline import LatestSlot, CameraController, InferenceWorker
+from frame_sources import try_open_camera
+from sprite_cache import SpriteCache
+from presenter import LetterboxPresenter, detect_screen_size
+from metrics import StageMetrics, MetricsExporter
+from quality import QualityController, describe
+from idle import IdleGate
+from audio import AudioEngine, NullBackend, PygameBackend
+
+WINDOW = "Nose Mirror"
+
+
+# ---- デバッグ互換ユーティリティ（落ちないように） ----
+def _ensure_debug_info(nl):
+    if not hasattr(nl, 'debug_mode'):
+        try: nl.debug_mode = False
+        except: pass
+    if not hasattr(nl, 'debug_info'):
+        try: nl.debug_info = {}
+        except: pass
+# ----------------------------------------------------
+
+
+class StartupReport:
+    """起動の各段階にかかった時間（プロセス開始からの ms と各段階の所要 ms）。"""
+    def __init__(self, t_start):
+        self.t_start = t_start
+        self.marks   = {}   # 段階 -> プロセス開始からの ms
+        self.spans   = {}   # 段階 -> 所要 ms
+
+    def mark(self, name):
+        self.marks[name] = round((time.perf_counter() - self.t_start) * 1e3, 1)
+
+    def span(self, name, t0):
+        self.spans[name] = round((time.perf_counter() - t0) * 1e3, 1)
+
+    def as_dict(self):
+        return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "at_ms": self.marks, "took_ms": self.spans}
+
+    def emit(self, path=""):
+        rec = self.as_dict()
+        print("startup: " + " ".join(f"{k}={v}ms" for k, v in self.marks.items())
+              + " | " + " ".join(f"{k}={v}ms" for k, v in self.spans.items()))
+        if path:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+class NoseMirrorPipeline:
+    """
+    run() で起動から終了までを行う。
+      - カメラを開いたらすぐ生のフレームを表示し、その間に検出モデル（mediapipe/scipy の
+        import とグラフ生成）をバックグラウンドで初期化する。準備ができたら鼻の描画を始める。
+      - 起動の内訳（import / UI / カメラ / 最初のフレーム / モデル初期化 / 最初の推論結果）を
+        StartupReport として表示し、startup_report_path があれば JSONL で追記する。
+    """
+    def __init__(self, cfg, t_start=None):
+        self.cfg       = cfg
+        self.startup   = StartupReport(t_start or time.perf_counter())
+        self.startup.mark("import")
+
+        # 設定値から初期化
+        self.swap_interval = float(cfg.get("swap_sec", 15.0))
+        self.max_scale     = float(cfg.get("max_scale", 4.5))
+        self.debug_overlay = bool(int(cfg.get("debug_overlay", 1)))
+        self.cam_index     = int(cfg.get("camera_index", 2))
+        # 実行モード: "threaded"（キャプチャ/推論/描画を分離）/ "serial"（従来の1スレッドループ）
+        #           "multiprocess"（threaded に加えてモデルをワーカープロセスで回す）
+        self.mode          = str(cfg.get("pipeline_mode", "threaded")).lower()
+
+        # ステージごとの処理時間（p50/p95/p99）。パスを指定すると定期的にファイルへ書き出す
+        self.metrics  = StageMetrics(enabled=bool(int(cfg.get("metrics_enabled", 1))))
+        self.exporter = (MetricsExporter(self.metrics, cfg["metrics_export_path"],
+                                         float(cfg.get("metrics_export_interval", 10.0)))
+                         if cfg.get("metrics_export_path") else None)
+
+        # 目標FPSに合わせて品質を段階的に変える（0 なら常に最高品質）
+        self.quality   = QualityController(target_fps=float(cfg.get("target_fps", 0)))
+        self._render_sec = 0.0   # 直前の描画（鼻の重ね描き・レターボックス・imshow/waitKey）の秒数
+        # 誰もいない間は推論を止めて差分だけ見る（idle_after_sec=0 で無効）
+        self.idle      = IdleGate(idle_after=float(cfg.get("idle_after_sec", 30.0)),
+                                  poll_hz=float(cfg.get("idle_poll_hz", 5.0)),
+                                  motion_thresh=float(cfg.get("idle_motion_thresh", 4.0)))
+        self.ui        = None
+        self.camera    = None          # CameraController（開く・切り替え・再接続はバックグラウンド）
+        self.frames    = LatestSlot()  # カメラの最新フレーム
+        self.presenter = None
+        self.processor = None          # バックグラウンドで作る FrameProcessor
+        self.workers   = None          # multiprocess 時の ModelWorkerPool
+        self._ready    = threading.Event()
+        self._init_error = None
+        self.audio     = AudioEngine(NullBackend())   # _init_audio で差し替える
+        self._load_noses()
+
+    # ──────────────────────────────────────────────
+    # 初期化
+    # ──────────────────────────────────────────────
+    def _load_noses(self):
+        # 鼻画像
+        self.nose_images, self.nose_alphas = [], []
+        for path in sorted(glob("assets/nose_*.png")):
+            img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+            if img is not None and img.shape[2] == 4:
+                self.nose_images.append(img[:, :, :3])
+                self.nose_alphas.append(img[:, :, 3].copy())   # uint8 のまま保持
+        if not self.nose_images:
+            print("Warning: 鼻画像が見つかりません。")
+
+        # 鼻スプライト（リサイズ済み画像＋マスク）のキャッシュ
+        cfg = self.cfg
+        self.sprites = SpriteCache(
+            self.nose_images, self.nose_alphas,
+            step=int(cfg.get("sprite_size_step", 4)),
+            max_bytes=int(cfg.get("sprite_cache_mb", 32)) * 1024 * 1024,
+            premultiplied=True,
+        )
+
+    def _init_models(self):
+        """バックグラウンド: 検出モデルの import・生成・ウォームアップ。"""
+        t0 = time.perf_counter()
+        try:
+            from frame_processor import FrameProcessor   # mediapipe / scipy はここで読み込む
+            if self.mode == "multiprocess":
+                from model_workers import ModelWorkerPool
+                self.workers = ModelWorkerPool(
+                    self.cfg, metrics=self.metrics,
+                    slots=int(self.cfg.get("mp_ring_slots", 4)),
+                    timeout=float(self.cfg.get("mp_result_timeout", 0.5)))
+            proc = FrameProcessor(self.cfg, n_images=len(self.nose_images), metrics=self.metrics,
+                                  remote=self.workers)
+            proc.swap_interval = self.swap_interval
+            proc.debug_overlay = self.debug_overlay
+            proc.warm_up()
+            if int(self.cfg.get("sprite_prewarm", 0)):
+                self.sprites.prewarm(range(48, 321, self.sprites.step))
+            self.processor = proc
+        except Exception as e:
+            self._init_error = e
+        finally:
+            self.startup.span("model_init", t0)
+            self._ready.set()
+
+    def _init_audio(self):
+        t0 = time.perf_counter()
+        # サウンド（"null" なら音を出さない。音声デバイスが無い環境でもそのまま動く）
+        backend = NullBackend()
+        if self.cfg.get("audio_backend", "pygame") != "null":
+            try:
+                backend = PygameBackend()
+            except Exception:
+                print("Warning: 音声がロードできませんでした。")
+        self.audio = AudioEngine(backend, fade=float(self.cfg.get("audio_fade_sec", 0.25)))
+        self.audio.start()
+        self.startup.span("audio_init", t0)
+
+    def _init_display(self):
+        t0 = time.perf_counter()
+        self.ui = SettingsUI(self.cfg)  # 別ウィンドウでトラックバー表示
+        # 表示解像度（設定が0なら実ディスプレイから検出）
+        sw, sh = int(self.cfg.get("screen_width", 0)), int(self.cfg.get("screen_height", 0))
+        if sw <= 0 or sh <= 0:
+            sw, sh = detect_screen_size()
+        self.presenter = LetterboxPresenter(sw, sh)
+        # フルスクリーン
+        cv2.namedWindow(WINDOW, cv2.WND_PROP_FULLSCREEN)
+        cv2.setWindowProperty(WINDOW, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+        self.startup.span("ui", t0)
+
+    # ──────────────────────────────────────────────
+    # 毎フレーム
+    # ──────────────────────────────────────────────
+    def apply_settings(self):
+        """設定UIの反映（毎フレーム/軽い）。カメラ番号が変わったら新しい番号を返す。"""
+        new_cfg = self.ui.read()
+        self.swap_interval = float(new_cfg["swap_sec"])
+        self.max_scale     = float(new_cfg["max_scale"])
+        self.debug_overlay = bool(int(new_cfg["debug_overlay"]))
+        self.quality.target_fps = float(new_cfg["target_fps"])
+        if self.processor is not None:
+            self.processor.swap_interval = self.swap_interval
+            self.processor.debug_overlay = self.debug_overlay
+        if new_cfg["camera_index"] != self.cam_index:
+            self.cam_index = int(new_cfg["camera_index"])
+            return self.cam_index
+        return None
+
+    def process_frame(self, frame, frame_ts):
+        """推論結果の dict。アイドル中で推論しなかったフレームは None。"""
+        idle = self.idle
+        if not idle.should_process(frame, frame_ts):
+            self._report_idle(frame_ts)
+            return None
+        t0 = time.perf_counter()
+        with self.metrics.stage("inference"):
+            res = self.processor.process(frame, frame_ts)
+        # 推論＋描画の1フレームの時間から品質の段階を決める（推論スレッド内で反映するので process とは競合しない）。
+        # serial は推論と描画を順に回すので和、threaded/multiprocess は並行に回るので遅い方が表示の FPS を決める
+        infer_sec, render_sec = time.perf_counter() - t0, self._render_sec
+        frame_sec = infer_sec + render_sec if self.mode == "serial" else max(infer_sec, render_sec)
+        tier = self.quality.observe(frame_sec)
+        if tier is not None:
+            self.processor.apply_quality(tier)
+            self.metrics.count("quality_change")
+        was_idle = idle.transitions
+        idle.observe(bool(res["landmarks_by_id"]), frame_ts)
+        if idle.transitions != was_idle:
+            self.metrics.count("idle_enter")
+        self._report_idle(frame_ts)
+        return res
+
+    def _report_idle(self, now):
+        for state, sec in self.idle.report(now).items():
+            self.metrics.set(f"{state}_sec", sec)
+
+    def render(self, frame, res):
+        """推論結果があれば描画、アイドル中（res が None）はそのまま映して音を止める。ESCでTrue。"""
+        t0 = time.perf_counter()
+        if res is None:
+            self.audio.set_paused(True)
+            done = self.show(frame)
+        else:
+            self.audio.set_paused(False)
+            self._mark_first_result()
+            done = self.render_result(frame, res)
+        self._render_sec = time.perf_counter() - t0   # 品質の段階の判断に使う（process_frame）
+        return done
+
+    def show(self, frame):
+        """フルスクリーン表示（キャンバスは使い回し）。ESCでTrueを返す。"""
+        with self.metrics.stage("letterbox"):
+            canvas = self.presenter.present(frame)
+        with self.metrics.stage("display"):
+            cv2.imshow(WINDOW, canvas)
+            key = cv2.waitKey(1) & 0xFF
+        if self.exporter is not None:
+            self.exporter.maybe_flush()
+        return key == 27  # ESC
+
+    def render_result(self, frame, res):
+        """process_frame の結果を同じフレームに描画して表示する。ESCでTrueを返す。"""
+        landmarks_by_id = res["landmarks_by_id"]
+        smile_by_id     = res["smile_by_id"]
+        nose_scales     = res["nose_scales"]
+        r_assigned_id   = res["assigned_id"]
+        r_img_idx       = res["assigned_img_idx"]
+
+        # サウンド（層が変わった時だけ音声スレッドがクロスフェードする）
+        self.audio.set_smile(float(np.mean(list(smile_by_id.values()))) if smile_by_id else None)
+
+        # ---- デバッグ表示 ----
+        if self.debug_overlay and res["debug_lines"]:
+            _ensure_debug_info(self.processor.nose_logic)
+            for text, org, font_scale, color in res["debug_lines"]:
+                cv2.putText(frame, text, org, cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, 2)
+            st = self.sprites.stats()
+            cv2.putText(frame, f"Sprite cache: hit {st['hit_rate']*100:.0f}% ({st['hits']}/{st['misses']})"
+                               f" {st['entries']} ent {st['bytes']/1e6:.1f}MB",
+                        (10, org[1] + 28), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200,200,255), 2)
+            q = self.quality
+            q_text = (f"Quality: {describe(q.tier)} {q.fps:.1f}/{q.target_fps:.0f}fps"
+                      if q.target_fps > 0 else "Quality: fixed (target_fps=0)")
+            cv2.putText(frame, q_text, (10, org[1] + 56), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200,200,255), 2)
+            if self.processor.reid is not None:
+                st = self.processor.reid.stats()
+                cv2.putText(frame, f"Re-ID: hit {st['hit_rate']*100:.0f}% ({st['hits']}/{st['lookups']})"
+                                   f" {st['entries']} ent {st['lookup_us']:.0f}us",
+                            (10, org[1] + 84), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200,200,255), 2)
+
+            # 処理時間（右上）
+            mx, my = frame.shape[1] - 330, 30
+            cv2.putText(frame, "stage      p50    p95    p99 [ms]", (mx, my),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,200,255), 1)
+            for line in self.metrics.debug_lines():
+                my += 20
+                cv2.putText(frame, line, (mx, my), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200,200,255), 1)
+
+        # ---- 鼻オーバーレイ（元の参照方法のまま）----
+        if r_assigned_id in landmarks_by_id and self.nose_images:
+            pts = landmarks_by_id[r_assigned_id]
+            x_n, y_n, _ = pts[NOSE_TIP]
+            base = res["base_size_by_id"][r_assigned_id]
+
+            # 1人：自分、2人：相手、3人以上：相手の最大
+            scale = nose_scales.get(r_assigned_id, 3.0)
+            if len(landmarks_by_id) == 2:
+                other_id = next(i for i in landmarks_by_id.keys() if i != r_assigned_id)
+                scale = nose_scales.get(other_id, 3.0)
+            elif len(landmarks_by_id) >= 3:
+                others = [i for i in landmarks_by_id.keys() if i != r_assigned_id]
+                scale = max(nose_scales.get(i, 3.0) for i in others)
+
+            # ★ UIの上限クランプを適用
+            scale = min(self.max_scale, float(scale))
+
+            size  = max(8, int(base * float(scale)))
+
+            with self.metrics.stage("overlay"):
+                premul, inv_a = self.sprites.get(r_img_idx, size)
+                size  = premul.shape[0]   # 量子化後のサイズで位置合わせ
+                tx = int(x_n - size/2); ty = int(y_n - size*0.7)
+                overlay_image_premul(frame, premul, inv_a, (tx, ty))
+
+        return self.show(frame)
+
+    # ──────────────────────────────────────────────
+    # ループ
+    # ──────────────────────────────────────────────
+    def _next_frame(self):
+        """カメラの最新フレーム（FramePacket）。来ていなければ None。"""
+        new_index = self.apply_settings()
+        if new_index is not None:
+            self.camera.request_camera(new_index)   # 開けるまでは今のカメラのまま
+        return self.frames.get(timeout=0.05)
+
+    def _run_until_ready(self, t_camera):
+        """モデル準備中は生のフレームをそのまま映す。ESCでTrueを返す。"""
+        first = True
+        while not self._ready.is_set():
+            pkt = self._next_frame()
+            if pkt is None:
+                # カメラ待ち（接続中・再接続中）でもウィンドウは応答させる
+                if (cv2.waitKey(1) & 0xFF) == 27: return True
+                continue
+            if self.show(pkt.image):
+                return True
+            if first:
+                self.startup.span("camera_open", t_camera)
+                self.startup.mark("first_frame")
+                first = False
+                # 最初のフレームを出してから音を用意する（表示を待たせない）
+                self._init_audio()
+        if first:
+            self.startup.mark("first_frame")
+            self._init_audio()
+        return False
+
+    def run_serial(self):
+        """従来どおり 読込→推論→描画 を1スレッドで順に回す（読込はカメラの最新フレーム）。"""
+        while True:
+            pkt = self._next_frame()
+            if pkt is None:
+                if (cv2.waitKey(1) & 0xFF) == 27: break
+                continue
+            res = self.process_frame(pkt.image, pkt.ts)
+            if self.render(pkt.image, res):
+                break
+
+    def run_threaded(self):
+        """
+        推論を別スレッドに分け、最新フレームだけを容量1のスロットで受け渡す。
+        描画（imshow/waitKey）は HighGUI の制約上このスレッド（メイン）で行う。
+        """
+        stop = threading.Event()
+        result_slot = LatestSlot()
+        worker = InferenceWorker(self.process_frame, self.frames, result_slot, stop)
+        worker.start()
+        try:
+            while not stop.is_set():
+                new_index = self.apply_settings()
+                if new_index is not None:
+                    self.camera.request_camera(new_index)
+
+                item = result_slot.get(timeout=0.05)
+                if item is None:
+                    # 結果待ち（カメラ再接続中を含む）でもウィンドウは応答させる
+                    if (cv2.waitKey(1) & 0xFF) == 27: break
+                    continue
+                pkt, res = item
+                if self.render(pkt.image, res):
+                    break
+        finally:
+            stop.set()
+            worker.join(timeout=2.0)
+        if worker.error is not None:
+            raise worker.error
+
+    def _mark_first_result(self):
+        if "first_result" not in self.startup.marks:
+            self.startup.mark("first_result")
+            self.startup.emit(self.cfg.get("startup_report_path", ""))
+
+    def run(self):
+        self._init_display()
+        # モデルはカメラを開いている間にバックグラウンドで用意する
+        threading.Thread(target=self._init_models, name="model-init", daemon=True).start()
+        t0 = time.perf_counter()
+        cfg = self.cfg
+        self.camera = CameraController(
+            try_open_camera, self.cam_index, self.frames, metrics=self.metrics,
+            stall_timeout=float(cfg.get("camera_stall_timeout", 2.0)),
+            backoff_max=float(cfg.get("camera_backoff_max", 10.0))).start()
+        try:
+            if self._run_until_ready(t0):
+                return
+            if self._init_error is not None:
+                raise self._init_error
+            if self.mode == "serial":
+                self.run_serial()
+            else:
+                self.run_threaded()
+
+            # ループ終了
+        finally:
+            # 最終設定を保存（UI の項目と、config.json に元から書かれていた項目だけ。既定値は書き出さない）
+            print("state time [s]:", self.idle.report())
+            if self.audio.is_alive():
+                self.audio.stop()
+            final_cfg = self.ui.read()
+            save_config({**load_saved_config(), **final_cfg})
+            self.camera.stop()
+            if self.workers is not None:
+                self.workers.close()
+            cv2.destroyAllWindows()
@@ -0,0 +1,78 @@
+# presenter.py — フルスクリーン表示用のレターボックス（キャンバスは1枚を使い回す）
+import sys
+
+import cv2
+import numpy as np
+
+DEFAULT_SCREEN = (1920, 1080)
+
+
+def detect_screen_size(default=DEFAULT_SCREEN):
+    """
+    プライマリディスプレイの解像度 (w, h)。
+    Windows は Win32 API（DPI スケーリング前の実ピクセル）、それ以外は tkinter、
+    取れなければ default。
+    """
+    if sys.platform.startswith("win"):
+        try:
+            import ctypes
+            user32 = ctypes.windll.user32
+            try: user32.SetProcessDPIAware()
+            except Exception: pass
+            w, h = user32.GetSystemMetrics(0), user32.GetSystemMetrics(1)
+            if w > 0 and h > 0:
+                return int(w), int(h)
+        except Exception:
+            pass
+    try:
+        import tkinter
+        root = tkinter.Tk(); root.withdraw()
+        w, h = root.winfo_screenwidth(), root.winfo_screenheight()
+        root.destroy()
+        if w > 0 and h > 0:
+            return int(w), int(h)
+    except Exception:
+        pass
+    return default
+
+
+class LetterboxPresenter:
+    """
+    present(frame) -> 表示用画像
+      - 画面と同じ大きさのキャンバスを1枚だけ確保し、レターボックス領域のビューへ
+        cv2.resize(dst=...) で直接書き込む（毎フレームの確保・コピーなし）。
+      - フレーム/画面サイズが変わった時だけ配置を計算し直し、余白を黒で塗る。
+      - フレームが画面とちょうど同じ大きさならフレームをそのまま返す。
+    """
+    def __init__(self, screen_w, screen_h, interpolation=cv2.INTER_AREA):
+        self.interpolation = interpolation
+        self._canvas = None
+        self._view   = None
+        self._key    = None
+        self.set_screen(screen_w, screen_h)
+
+    def set_screen(self, screen_w, screen_h):
+        self.screen_w, self.screen_h = int(screen_w), int(screen_h)
+        self._canvas = np.zeros((self.screen_h, self.screen_w, 3), dtype=np.uint8)
+        self._key = None
+
+    def _layout(self, fw, fh):
+        sw, sh = self.screen_w, self.screen_h
+        fa, sa = fw/fh, sw/sh
+        if fa > sa: nw, nh = sw, int(sw/fa)
+        else:       nh, nw = sh, int(sh*fa)
+        ox = (sw - nw)//2; oy = (sh - nh)//2
+        self._canvas[:] = 0
+        self._view = self._canvas[oy:oy+nh, ox:ox+nw]
+
+    def present(self, frame):
+        fh, fw = frame.shape[:2]
+        if (fw, fh) == (self.screen_w, self.screen_h):
+            return frame
+        key = (fw, fh, self.screen_w, self.screen_h)
+        if key != self._key:
+            self._layout(fw, fh)
+            self._key = key
+        nh, nw = self._view.shape[:2]
+        cv2.resize(frame, (nw, nh), dst=self._view, interpolation=self.interpolation)
+        return self._canvas
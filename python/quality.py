@@ -0,0 +1,73 @@
+# quality.py — 目標FPSを保つために処理の品質を段階的に上げ下げする
+from collections import deque, namedtuple
+
+# infer_height: 推論解像度の高さ（0 なら設定のまま）
+# detect_interval: (min, max) フレーム（None なら設定のまま。設定の方が長ければ設定を使う）
+# pose_complexity: Pose の model_complexity, max_faces: FaceMesh の最大人数, allow_hog: HOG補完を使うか
+QualityTier = namedtuple("QualityTier", "name infer_height detect_interval pose_complexity max_faces allow_hog")
+
+DEFAULT_TIERS = (
+    QualityTier("high",   0,   None,    1, 6, True),
+    QualityTier("mid",    540, (3, 12), 1, 4, True),
+    QualityTier("low",    360, (4, 15), 0, 3, True),
+    QualityTier("min",    270, (6, 20), 0, 2, False),
+)
+
+
+def describe(tier):
+    """デバッグ表示用の1行。"""
+    res = f"{tier.infer_height}p" if tier.infer_height else "native"
+    det = "{}-{}".format(*tier.detect_interval) if tier.detect_interval else "cfg"
+    return (f"{tier.name} ({res}, det {det}, pose {tier.pose_complexity}, "
+            f"faces {tier.max_faces}, hog {'on' if tier.allow_hog else 'off'})")
+
+
+class QualityController:
+    """
+    observe(frame_sec) -> 品質を変えた時だけ新しい QualityTier（それ以外は None）
+      - 直近 window フレームの処理時間の中央値から出せる FPS を見る。
+      - 目標の down_ratio 倍を下回ったら1段下げ、up_ratio 倍を上回ったら1段上げる
+        （上げ下げで閾値を変え、変えた後は hold フレーム判断しない＝行ったり来たりしない）。
+      - target_fps <= 0 なら止める（最高品質に戻す）。
+    """
+    def __init__(self, target_fps=0.0, tiers=DEFAULT_TIERS, window=30, hold=60,
+                 down_ratio=0.9, up_ratio=1.3):
+        self.tiers      = tuple(tiers)
+        self.target_fps = float(target_fps)
+        self.window     = int(window)
+        self.hold       = int(hold)
+        self.down_ratio = down_ratio
+        self.up_ratio   = up_ratio
+        self.level      = 0          # 0 が最高品質
+        self.fps        = 0.0        # 直近の推定FPS（処理時間から）
+        self.changes    = 0
+        self._times     = deque(maxlen=self.window)
+        self._cooldown  = 0
+
+    @property
+    def tier(self):
+        return self.tiers[self.level]
+
+    def _set(self, level):
+        self.level = level
+        self.changes += 1
+        self._times.clear()
+        self._cooldown = self.hold
+        return self.tier
+
+    def observe(self, frame_sec):
+        if self.target_fps <= 0:
+            return self._set(0) if self.level != 0 else None
+        self._times.append(frame_sec)
+        if self._cooldown > 0:
+            self._cooldown -= 1
+            return None
+        if len(self._times) < self.window:
+            return None
+        med = sorted(self._times)[len(self._times) // 2]
+        self.fps = 1.0 / med if med > 0 else float("inf")
+        if self.fps < self.target_fps * self.down_ratio and self.level < len(self.tiers) - 1:
+            return self._set(self.level + 1)
+        if self.fps > self.target_fps * self.up_ratio and self.level > 0:
+            return self._set(self.level - 1)
+        return None
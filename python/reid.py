@@ -0,0 +1,133 @@
+# reid.py — 見失った人の NoseLogic 状態を預かり、戻ってきた時に顔の形と色で見分けて返す
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from keyframe import landmarks_box
+from landmarks import register
+
+# 目の外側 左/右, 頬の外側 左/右, 額/顎, 鼻先, 上唇/下唇（表情で変わりにくい比を取る）
+EYE_L, EYE_R, CHEEK_L, CHEEK_R, FOREHEAD, CHIN, NOSE, LIP_U, LIP_D = 33, 263, 234, 454, 10, 152, 1, 13, 14
+register(EYE_L, EYE_R, CHEEK_L, CHEEK_R, FOREHEAD, CHIN, NOSE, LIP_U, LIP_D)
+
+HIST_BINS = (16, 4)   # 顔ボックスの H×S ヒストグラム
+
+
+def _dist(pts, a, b):
+    (xa, ya, _), (xb, yb, _) = pts[a], pts[b]
+    return float(np.hypot(xb - xa, yb - ya))
+
+
+def signature(frame, pts):
+    """
+    1人分の見分け用の特徴 (geometry, hist)。
+      geometry: 顔の比（目幅・頬幅・顔の高さ・鼻の位置・顎の長さ）。鼻・顎の比は 0 になり得る
+      hist:     顔ボックスの HSV の H×S ヒストグラム（合計1の平方根。距離が Hellinger になる）
+    ランドマークが足りない・顔が小さすぎる時は None。
+    """
+    try:
+        eye   = _dist(pts, EYE_L, EYE_R)
+        cheek = _dist(pts, CHEEK_L, CHEEK_R)
+        face  = _dist(pts, FOREHEAD, CHIN)
+        ex, ey = (np.asarray(pts[EYE_L][:2]) + np.asarray(pts[EYE_R][:2])) / 2.0
+        mx, my = (np.asarray(pts[LIP_U][:2]) + np.asarray(pts[LIP_D][:2])) / 2.0
+        nose  = float(np.hypot(pts[NOSE][0] - ex, pts[NOSE][1] - ey))
+        chin  = float(np.hypot(pts[CHIN][0] - mx, pts[CHIN][1] - my))
+    except (IndexError, TypeError):
+        return None
+    if eye < 8 or cheek < 8 or face < 8:
+        return None
+    geometry = np.array([cheek / eye, face / cheek, nose / eye, chin / face], dtype=np.float32)
+
+    x, y, w, h = landmarks_box(pts)
+    H, W = frame.shape[:2]
+    x0, y0, x1, y1 = max(0, x), max(0, y), min(W, x + w), min(H, y + h)
+    if x1 - x0 < 4 or y1 - y0 < 4:
+        return None
+    hsv = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, list(HIST_BINS), [0, 180, 0, 256]).ravel()
+    hist = np.sqrt(hist / max(hist.sum(), 1.0)).astype(np.float32)
+    return geometry, hist
+
+
+class ReIdCache:
+    """
+    put(pid, sig, state, now)  -> 見失った人の特徴と状態を預ける
+    take(sig, now)             -> 一番近い人の state（取り出すとキャッシュからは消える）。無ければ None
+      - 最大 capacity 人。入れた順に並べ、あふれたら一番古い人から捨てる。ttl 秒より古い人も捨てる。
+      - 特徴は capacity 行の配列に置き、照合は全員分を1回のベクトル計算で行う
+        （人数ではなく capacity で決まるので、何人来ても1回の照合の手間は変わらない）。
+      - 距離は 形の相対差（geo_tol で割る）と 色の Hellinger 距離 の平均。max_dist 以下なら同じ人。
+    """
+    def __init__(self, capacity=32, ttl=60.0, max_dist=0.35, geo_tol=0.08):
+        self.capacity = max(1, int(capacity))
+        self.ttl      = float(ttl)
+        self.max_dist = float(max_dist)
+        self.geo_tol  = float(geo_tol)
+        self._geo     = np.zeros((self.capacity, 4), dtype=np.float32)
+        self._hist    = np.zeros((self.capacity, HIST_BINS[0] * HIST_BINS[1]), dtype=np.float32)
+        self._entries = OrderedDict()   # 行 -> (pid, 預けた時刻, state)（古い順）
+        self._free    = list(range(self.capacity))
+        self.lookups  = 0
+        self.hits     = 0
+        self.evictions = 0
+        self._lookup_ns = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expire(self, now):
+        while self._entries:
+            row, (_, ts, _) = next(iter(self._entries.items()))
+            if now - ts <= self.ttl:
+                break
+            del self._entries[row]
+            self._free.append(row)
+            self.evictions += 1
+
+    def put(self, pid, sig, state, now):
+        if sig is None or state is None:
+            return
+        self._expire(now)
+        if not self._free:
+            row, _ = self._entries.popitem(last=False)
+            self._free.append(row)
+            self.evictions += 1
+        row = self._free.pop()
+        self._geo[row], self._hist[row] = sig
+        self._entries[row] = (pid, now, state)
+
+    def take(self, sig, now):
+        if sig is None:
+            return None
+        t0 = time.perf_counter_ns()
+        self.lookups += 1
+        self._expire(now)
+        state = None
+        if self._entries:
+            rows = np.fromiter(self._entries.keys(), dtype=np.intp, count=len(self._entries))
+            geo, hist = sig
+            # 相対差 |a/g - 1|。比が 0 の時に割らないよう分母に下限を置く
+            d_geo  = (np.abs(self._geo[rows] - geo) / np.maximum(np.abs(geo), 1e-3)).mean(axis=1) / self.geo_tol
+            d_hist = np.sqrt(0.5 * ((self._hist[rows] - hist) ** 2).sum(axis=1))
+            d = 0.5 * (np.minimum(d_geo, 1.0) + d_hist)
+            best = int(np.argmin(d))
+            if d[best] <= self.max_dist:
+                row = int(rows[best])
+                state = self._entries.pop(row)[2]
+                self._free.append(row)
+                self.hits += 1
+        self._lookup_ns += time.perf_counter_ns() - t0
+        return state
+
+    def stats(self) -> dict:
+        return {
+            "lookups":   self.lookups,
+            "hits":      self.hits,
+            "hit_rate":  self.hits / self.lookups if self.lookups else 0.0,
+            "entries":   len(self._entries),
+            "evictions": self.evictions,
+            "lookup_us": self._lookup_ns / self.lookups / 1e3 if self.lookups else 0.0,
+        }
@@ -0,0 +1,64 @@
+# replay.py — 録画/連番画像をカメラ・画面・音なしで実時間より速く処理し、フレームごとの結果を JSONL で出す
+#   python replay.py input.mp4 -o out.jsonl
+#   python replay.py frames_dir/ --fps 30 -o out.jsonl
+#   python replay.py --synthetic 300 -o out.jsonl      （assets/test-face.jpg から合成）
+# 時刻はフレームのタイムスタンプ、乱数は --seed で固定するので、同じ入力なら同じ出力になる。
+import argparse
+import json
+import sys
+import time
+from glob import glob
+
+from app_config import load_config
+from frame_processor import FrameProcessor
+from frame_sources import open_source, synthetic_frames
+
+
+def result_record(i, res):
+    """1フレーム分の出力（JSON のキーは文字列になるので ID も文字列で持つ）。"""
+    return {
+        "frame":       i,
+        "ts":          round(res["ts"], 6),
+        "tracks":      {str(k): [int(v[0]), int(v[1])] for k, v in res["objects"].items()},
+        "smile":       {str(k): round(v, 6) for k, v in res["smile_by_id"].items()},
+        "scale":       {str(k): round(v, 6) for k, v in res["nose_scales"].items()},
+        "assigned_id": res["assigned_id"],
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Nose Mirror headless replay")
+    ap.add_argument("input", nargs="?", help="動画ファイル or 連番画像ディレクトリ")
+    ap.add_argument("-o", "--out", default="-", help="出力 JSONL（- で標準出力）")
+    ap.add_argument("--fps", type=float, default=None, help="タイムスタンプ用の fps（省略時は動画の値/30）")
+    ap.add_argument("--seed", type=int, default=0, help="割当の乱数シード")
+    ap.add_argument("--synthetic", type=int, metavar="N", help="入力の代わりに合成フレームを N 枚使う")
+    args = ap.parse_args(argv)
+
+    if args.synthetic:
+        frames = synthetic_frames(args.synthetic, args.fps or 30.0)
+    elif args.input:
+        frames = open_source(args.input, args.fps)
+    else:
+        ap.error("input か --synthetic を指定してください")
+
+    cfg = load_config()
+    processor = FrameProcessor(cfg, n_images=max(1, len(glob("assets/nose_*.png"))), seed=args.seed)
+    processor.debug_overlay = False
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    t0 = time.perf_counter(); n = 0
+    try:
+        for i, (ts, frame) in enumerate(frames):
+            res = processor.process(frame, ts)
+            out.write(json.dumps(result_record(i, res), ensure_ascii=False) + "\n")
+            n += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    dt = time.perf_counter() - t0
+    print(f"{n} frames in {dt:.1f}s ({n / dt if dt else 0:.1f} fps)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# roi_mesh.py — トラックごとの顔の切り抜きをタイル状に並べ、FaceMesh を1回で回す
+import math
+
+import cv2
+import numpy as np
+
+from landmarks import register
+from nose_logic import NOSE_TIP
+
+register(NOSE_TIP)   # どのタイルの顔かを鼻の位置で決める
+
+
+class RoiMeshBatcher:
+    """
+    mosaic = build(frame, boxes_by_id) -> FaceMesh に渡す1枚の画像（タイル並べ）
+    batch, ids = map_back(batch)        -> フレーム座標のランドマークと、それぞれのトラックID
+      - 各トラックの顔ボックスを pad 倍だけ広げた正方形で切り抜き、tile×tile に拡大縮小して並べる
+        （遠くの小さい顔もタイルいっぱいに拡大されるので、口元の点の精度が上がる）。
+      - 切り抜きがそのまま ID になるので、メッシュとトラックの対応付けは不要。
+      - フレーム外にはみ出す部分は黒で埋める（座標の変換は一律のまま）。
+      - タイルは max_faces 個まで（ID の小さい順）。
+    """
+    def __init__(self, tile=256, pad=0.5, max_faces=6):
+        self.tile      = int(tile)
+        self.pad       = float(pad)
+        self.max_faces = int(max_faces)
+        self._mosaic   = None
+        self._tiles    = []    # [(id, x0, y0, 拡大率), ...]（フレーム座標の切り抜き左上）
+        self._cols     = 1
+
+    def _crop_square(self, box):
+        x, y, w, h = box
+        side = max(w, h) * (1.0 + 2.0 * self.pad)
+        cx, cy = x + w / 2.0, y + h / 2.0
+        return cx - side / 2.0, cy - side / 2.0, max(side, 1.0)
+
+    def build(self, frame, boxes_by_id):
+        """boxes_by_id: {id: (x, y, w, h)}（フレーム座標）。トラックが無ければ None。"""
+        ids = sorted(boxes_by_id)[:self.max_faces]
+        self._tiles = []
+        if not ids:
+            return None
+        T = self.tile
+        cols = math.ceil(math.sqrt(len(ids)))
+        rows = math.ceil(len(ids) / cols)
+        shape = (rows * T, cols * T, 3)
+        if self._mosaic is None or self._mosaic.shape != shape:
+            self._mosaic = np.zeros(shape, dtype=np.uint8)
+        self._cols = cols
+
+        for k, oid in enumerate(ids):
+            x0, y0, side = self._crop_square(boxes_by_id[oid])
+            s = T / side
+            r, c = divmod(k, cols)
+            view = self._mosaic[r*T:(r+1)*T, c*T:(c+1)*T]
+            # 切り抜き＋拡大縮小を1回で。はみ出した所は黒
+            M = np.float32([[s, 0, -x0 * s], [0, s, -y0 * s]])
+            cv2.warpAffine(frame, M, (T, T), dst=view, flags=cv2.INTER_LINEAR,
+                           borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+            self._tiles.append((oid, x0, y0, s))
+        return self._mosaic
+
+    def map_back(self, batch, col):
+        """
+        batch: モザイク座標の (faces, K, 3)。col: {ランドマーク番号: 列}
+        return: (フレーム座標の (faces', K, 3), [id, ...])
+          1タイルに2人写っていたらタイル中心に近い方だけを使う。
+        """
+        T = self.tile
+        n = len(self._tiles)
+        best = {}   # タイル番号 -> (中心からの距離, face)
+        for f in range(len(batch)):
+            nx, ny = batch[f, col[NOSE_TIP], :2]
+            c, r = int(nx // T), int(ny // T)
+            k = r * self._cols + c
+            if not (0 <= c < self._cols and 0 <= k < n):
+                continue
+            d = (nx - (c + 0.5) * T) ** 2 + (ny - (r + 0.5) * T) ** 2
+            if k not in best or d < best[k][0]:
+                best[k] = (d, f)
+
+        order = sorted(best)
+        out = np.empty((len(order), batch.shape[1], 3), dtype=np.float32)
+        ids = []
+        for i, k in enumerate(order):
+            f = best[k][1]
+            oid, x0, y0, s = self._tiles[k]
+            r, c = divmod(k, self._cols)
+            out[i] = batch[f]
+            out[i, :, 0] = (batch[f, :, 0] - c * T) / s + x0
+            out[i, :, 1] = (batch[f, :, 1] - r * T) / s + y0
+            ids.append(oid)
+        return out, ids
@@ -0,0 +1,212 @@
+# soak.py — 長時間試験。合成の来場者 or 録画のループで何時間分も実時間より速く回し、メモリと処理時間が増え続けないかを見る
+#   python soak.py --hours 10 --report soak.jsonl                 … 合成（人数と顔ぶれが churn 秒ごとに入れ替わる）
+#   python soak.py session.mp4 --hours 2 --report soak.jsonl      … 録画を繰り返し流す
+#   python soak.py --hours 0.5 --sample-min 1 --max-rss-growth 20
+# sample 分（映像の時間）ごとに RSS・tracemalloc の増えた場所・追跡/ロジックの状態の大きさ・処理時間の分位を記録し、
+# warmup 後の最初の記録からの増え方が上限を超えたら終了コード 1。
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from glob import glob
+
+import numpy as np
+
+from app_config import load_config
+from audio import AudioEngine, NullBackend
+from frame_processor import FrameProcessor
+from frame_sources import crowd_frames, open_source
+from metrics import process_memory
+from sprite_cache import draw_nose, load_sprites
+
+
+def visitor_frames(fps=30.0, size=(1280, 720), max_faces=8, churn_sec=20.0, seed=0):
+    """合成の来場者（終わらない列）。churn_sec ごとに人数（0〜max_faces）と顔の配置が変わる。"""
+    rng = np.random.default_rng(seed)
+    per = max(1, int(churn_sec * fps))
+    t_off = 0.0
+    while True:
+        n_faces = int(rng.integers(0, max_faces + 1))
+        for ts, frame in crowd_frames(per, n_faces, fps, size, seed=int(rng.integers(1 << 31))):
+            yield t_off + ts, frame
+        t_off += per / fps
+
+
+def looped_frames(src, fps=None):
+    """録画を繰り返し流す（終わらない列）。時刻は周回をまたいで増え続ける。"""
+    t_off = 0.0
+    while True:
+        last = None
+        for ts, frame in open_source(src, fps):
+            last = ts
+            yield t_off + ts, frame
+        if last is None:
+            raise IOError(f"フレームがありません: {src}")
+        t_off += last + 1.0 / (fps or 30.0)
+
+
+def state_sizes(processor, sprites):
+    """増え続けていないかを見る状態の大きさ。"""
+    ct, nl = processor.ct, processor.nose_logic
+    return {
+        "tracks":       len(ct.objects),
+        "free_ids":     len(ct.availableIDs),
+        "next_id":      ct.nextObjectID,
+        "velocity":     len(getattr(ct, "velocity", ())),
+        "logic_ids":    len(nl.ids_live),
+        "logic_slots":  len(nl.scales),
+        "reid_entries": len(processor.reid) if processor.reid is not None else 0,
+        "reid_sigs":    len(processor._reid_sig),
+        "reid_held":    len(processor._reid_held),
+        "prev_marks":   len(processor.prev_landmarks_by_id),
+        "sprite_bytes": sprites.nbytes if sprites is not None else 0,
+        "gc_objects":   len(gc.get_objects()),
+    }
+
+
+def top_growth(snapshot, baseline, limit):
+    """baseline からの tracemalloc の増加が大きい行（"file:line +KB (+個)"）。"""
+    if snapshot is None or baseline is None:
+        return []
+    out = []
+    for st in snapshot.compare_to(baseline, "lineno")[:limit]:
+        if st.size_diff <= 0:
+            break
+        frame = st.traceback[0]
+        out.append(f"{frame.filename}:{frame.lineno} +{st.size_diff / 1024:.1f}KB (+{st.count_diff})")
+    return out
+
+
+def check(samples, max_rss_growth, max_py_growth, max_p95_ratio):
+    """warmup 後の最初の記録と最後の記録を比べ、上限を超えた項目の説明を返す。"""
+    steady = [s for s in samples if not s["warmup"]]
+    if len(steady) < 2:
+        return []
+    first, last = steady[0], steady[-1]
+    hours = max(last["video_h"] - first["video_h"], 1e-9)
+    fails = []
+    if first["rss_mb"] is not None and last["rss_mb"] is not None:
+        d = last["rss_mb"] - first["rss_mb"]
+        if d > max_rss_growth:
+            fails.append(f"RSS +{d:.1f}MB ({d / hours:.1f}MB/h) > {max_rss_growth}MB")
+    if first["py_mb"] is not None and last["py_mb"] is not None:
+        d = last["py_mb"] - first["py_mb"]
+        if d > max_py_growth:
+            fails.append(f"tracemalloc +{d:.1f}MB ({d / hours:.1f}MB/h) > {max_py_growth}MB")
+    p0, p1 = first["frame_ms"]["p95"], last["frame_ms"]["p95"]
+    if p0 > 0 and p1 / p0 > max_p95_ratio:
+        fails.append(f"frame p95 {p0:.2f}ms -> {p1:.2f}ms (x{p1 / p0:.2f}) > x{max_p95_ratio}")
+    return fails
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Nose Mirror soak test")
+    ap.add_argument("input", nargs="?", help="繰り返し流す録画（省略時は合成の来場者）")
+    ap.add_argument("--hours", type=float, default=10.0, help="流す映像の長さ（時間）")
+    ap.add_argument("--fps", type=float, default=30.0)
+    ap.add_argument("--size", default="1280x720", help="合成フレームの大きさ")
+    ap.add_argument("--max-faces", type=int, default=8, help="合成の最大人数")
+    ap.add_argument("--churn-sec", type=float, default=20.0, help="合成の顔ぶれが入れ替わる間隔（秒）")
+    ap.add_argument("--sample-min", type=float, default=5.0, help="記録の間隔（映像の分）")
+    ap.add_argument("--warmup-min", type=float, default=10.0, help="基準にしない最初の時間（映像の分）")
+    ap.add_argument("--no-tracemalloc", action="store_true", help="tracemalloc を使わない（処理時間だけ見る時）")
+    ap.add_argument("--top", type=int, default=5, help="記録する tracemalloc の増加箇所の数")
+    ap.add_argument("--max-rss-growth", type=float, default=50.0, help="RSS の増加の上限（MB）")
+    ap.add_argument("--max-py-growth", type=float, default=20.0, help="tracemalloc の増加の上限（MB）")
+    ap.add_argument("--max-p95-ratio", type=float, default=1.5, help="フレーム時間 p95 の増加の上限（倍）")
+    ap.add_argument("--report", default="", help="記録を JSONL で書くパス（最後の行が結果）")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    cfg = load_config()
+    processor = FrameProcessor(cfg, n_images=max(1, len(glob("assets/nose_*.png"))), seed=args.seed)
+    processor.debug_overlay = False
+    sprites = load_sprites()
+    audio = AudioEngine(NullBackend(), fade=float(cfg.get("audio_fade_sec", 0.25)))
+    audio.start()
+
+    if args.input:
+        frames = looped_frames(args.input, args.fps)
+    else:
+        w, h = (int(v) for v in args.size.lower().split("x"))
+        frames = visitor_frames(args.fps, (w, h), args.max_faces, args.churn_sec, args.seed)
+
+    trace = not args.no_tracemalloc
+    if trace:
+        tracemalloc.start(1)
+    report = open(args.report, "w", encoding="utf-8") if args.report else None
+    end = args.hours * 3600.0
+    interval = args.sample_min * 60.0
+    warmup = args.warmup_min * 60.0
+    samples, frame_ns = [], []
+    baseline_snap = None
+    next_sample = interval
+    n = 0
+    t0 = time.perf_counter()
+
+    def sample(ts):
+        nonlocal baseline_snap
+        snap = tracemalloc.take_snapshot() if trace else None
+        rss, _ = process_memory()
+        ms = np.asarray(frame_ns) / 1e6
+        s = {
+            "video_h":  round(ts / 3600.0, 3),
+            "wall_sec": round(time.perf_counter() - t0, 1),
+            "frames":   n,
+            "speed_x":  round(ts / (time.perf_counter() - t0), 2),
+            "warmup":   ts < warmup,
+            "rss_mb":   round(rss, 1) if rss is not None else None,
+            "py_mb":    round(tracemalloc.get_traced_memory()[0] / 2**20, 2) if trace else None,
+            "frame_ms": {f"p{q}": round(float(np.percentile(ms, q)), 3) for q in (50, 95, 99)},
+            "state":    state_sizes(processor, sprites),
+            "top_growth": top_growth(snap, baseline_snap, args.top),
+        }
+        if not s["warmup"] and baseline_snap is None:
+            baseline_snap = snap   # 以降は warmup 明けからの増加を出す
+        frame_ns.clear()
+        samples.append(s)
+        if report is not None:
+            report.write(json.dumps(s, ensure_ascii=False) + "\n"); report.flush()
+        print(f"[{s['video_h']:6.2f}h x{s['speed_x']:.1f}] rss {s['rss_mb']}MB py {s['py_mb']}MB "
+              f"p50/p95 {s['frame_ms']['p50']:.2f}/{s['frame_ms']['p95']:.2f}ms "
+              f"tracks {s['state']['tracks']} gc {s['state']['gc_objects']}"
+              + (" (warmup)" if s["warmup"] else ""), file=sys.stderr)
+
+    try:
+        for ts, frame in frames:
+            if ts >= end:
+                break
+            f0 = time.perf_counter_ns()
+            res = processor.process(frame, ts)
+            smiles = res["smile_by_id"]
+            audio.set_smile(float(np.mean(list(smiles.values()))) if smiles else None)
+            draw_nose(frame, res, sprites)
+            frame_ns.append(time.perf_counter_ns() - f0)
+            n += 1
+            if ts >= next_sample:
+                sample(ts)
+                next_sample += interval
+    except KeyboardInterrupt:
+        print("interrupted", file=sys.stderr)
+    finally:
+        audio.stop()
+        if trace:
+            tracemalloc.stop()
+
+    fails = check(samples, args.max_rss_growth, args.max_py_growth, args.max_p95_ratio)
+    result = {"result": "fail" if fails else "ok", "fails": fails, "frames": n,
+              "wall_sec": round(time.perf_counter() - t0, 1), "samples": len(samples)}
+    if report is not None:
+        report.write(json.dumps(result, ensure_ascii=False) + "\n")
+        report.close()
+    print(f"soak {result['result']}: {n} frames in {result['wall_sec']}s"
+          + "".join(f"\n  - {f}" for f in fails), file=sys.stderr)
+    if len([s for s in samples if not s["warmup"]]) < 2:
+        print("  (warmup 後の記録が2つ未満なので増加は判定していません)", file=sys.stderr)
+    return 1 if fails else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# sprite_cache.py — 鼻画像とアルファをサイズ量子化してキャッシュ（LRU＋メモリ上限）
+from collections import OrderedDict
+from glob import glob
+
+import cv2
+
+from nose_logic import NOSE_TIP
+from utils import overlay_image_premul, premultiply_sprite
+
+
+class SpriteCache:
+    """
+    get(idx, size) -> (bgr, alpha)  /  premultiplied=True なら (premul, inv_alpha)
+      - キーは (画像番号, size を step 単位に丸めた値)。返る画像の一辺は丸めた値。
+      - alpha は uint8（0..255）で保持（float64 の 1/8 のメモリ）。
+      - premultiplied=True なら utils.overlay_image_premul 用の形で保持する。
+      - 合計バイト数が max_bytes を超えたら古い順に捨てる。
+    images: BGR uint8 のリスト, alphas: uint8 マスクのリスト（同じ並び）
+    """
+    def __init__(self, images, alphas, step=4, max_bytes=32 * 1024 * 1024, premultiplied=False):
+        self.images    = images
+        self.alphas    = alphas
+        self.step      = max(1, int(step))
+        self.max_bytes = int(max_bytes)
+        self.premultiplied = premultiplied
+        self._entries  = OrderedDict()   # (idx, q) -> (bgr, alpha)
+        self.nbytes    = 0
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    def quantize(self, size):
+        return max(self.step, int(round(size / self.step)) * self.step)
+
+    def _build(self, idx, q):
+        bgr   = cv2.resize(self.images[idx], (q, q))
+        alpha = cv2.resize(self.alphas[idx], (q, q))
+        if self.premultiplied:
+            return premultiply_sprite(bgr, alpha)
+        return bgr, alpha
+
+    def _insert(self, key, entry):
+        self._entries[key] = entry
+        self.nbytes += entry[0].nbytes + entry[1].nbytes
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, (b, a) = self._entries.popitem(last=False)
+            self.nbytes -= b.nbytes + a.nbytes
+            self.evictions += 1
+
+    def get(self, idx, size):
+        key = (idx, self.quantize(size))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = self._build(*key)
+        self._insert(key, entry)
+        return entry
+
+    def prewarm(self, sizes):
+        """起動時に全画像 × sizes を作っておく（統計には数えない）。"""
+        for idx in range(len(self.images)):
+            for size in sizes:
+                key = (idx, self.quantize(size))
+                if key not in self._entries:
+                    self._insert(key, self._build(*key))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "hit_rate":  self.hits / total if total else 0.0,
+            "entries":   len(self._entries),
+            "bytes":     self.nbytes,
+            "evictions": self.evictions,
+        }
+
+
+def load_sprites(pattern="assets/nose_*.png", **kwargs):
+    """鼻画像（BGRA の PNG）を読んで premultiplied の SpriteCache にする（ベンチ・長時間試験用）。無ければ None。"""
+    images, alphas = [], []
+    for path in sorted(glob(pattern)):
+        img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if img is not None and img.shape[2] == 4:
+            images.append(img[:, :, :3]); alphas.append(img[:, :, 3].copy())
+    return SpriteCache(images, alphas, premultiplied=True, **kwargs) if images else None
+
+
+def draw_nose(frame, res, sprites):
+    """pipeline.render_result と同じく、割当の人の鼻だけを描く（倍率は本人のもの）。"""
+    pid = res["assigned_id"]
+    pts = res["landmarks_by_id"].get(pid)
+    if pts is None or sprites is None:
+        return
+    x, y, _ = pts[NOSE_TIP]
+    size = max(8, int(res["base_size_by_id"][pid] * res["nose_scales"].get(pid, 3.0)))
+    premul, inv_a = sprites.get(res["assigned_img_idx"] or 0, size)
+    size = premul.shape[0]
+    overlay_image_premul(frame, premul, inv_a, (int(x - size / 2), int(y - size * 0.7)))
@@ -0,0 +1,86 @@
+# stage_graph.py — 入出力を宣言したステージを必要になった時だけ評価する小さなグラフ
+
+
+class _Stage:
+    def __init__(self, name, fn, inputs, outputs):
+        self.name    = name
+        self.fn      = fn
+        self.inputs  = tuple(inputs)
+        self.outputs = tuple(outputs)
+
+
+class _Inputs:
+    """ステージ関数に渡す入力ビュー。宣言していない名前は読めない。"""
+    def __init__(self, ctx, stage):
+        self._ctx = ctx
+        self._stage = stage
+
+    def __getitem__(self, name):
+        if name not in self._stage.inputs:
+            raise KeyError(f"stage '{self._stage.name}' は入力 '{name}' を宣言していません")
+        return self._ctx[name]
+
+
+class FrameContext:
+    """1フレーム分の評価結果。ctx[name] で初めて該当ステージ（と依存先）が実行される。"""
+    def __init__(self, graph, inputs):
+        self._graph  = graph
+        self._values = dict(inputs)
+        self._ran    = set()
+
+    def __getitem__(self, name):
+        if name in self._values:
+            return self._values[name]
+        stage = self._graph._producer.get(name)
+        if stage is None:
+            raise KeyError(f"'{name}' を出力するステージがありません")
+        out = stage.fn(_Inputs(self, stage))
+        self._ran.add(stage.name)
+        if len(stage.outputs) == 1:
+            self._values[stage.outputs[0]] = out
+        else:
+            self._values.update(zip(stage.outputs, out))
+        return self._values[name]
+
+    def provide(self, name, value):
+        """グラフ外（トラッカー等の状態を持つ処理）で得た値を後続ステージの入力として置く。"""
+        self._values[name] = value
+
+
+class StageGraph:
+    """
+    add(name, fn, inputs, outputs) でステージを登録し、ctx = graph.begin(...) で評価を始める。
+      - fn(inp) は inp["入力名"] で宣言済みの入力だけを（遅延で）読める
+      - outputs が1つなら戻り値そのもの、複数ならタプルで返す
+      - begin()/end() でフレームを区切り、終了時に各ステージの executed / skipped を数える
+    """
+    def __init__(self):
+        self._stages   = {}
+        self._producer = {}   # 出力名 -> ステージ
+        self.executed  = {}
+        self.skipped   = {}
+
+    def add(self, name, fn, inputs=(), outputs=None):
+        outputs = tuple(outputs) if outputs else (name,)
+        stage = _Stage(name, fn, inputs, outputs)
+        for out in outputs:
+            if out in self._producer:
+                raise ValueError(f"出力 '{out}' は既に '{self._producer[out].name}' が出力しています")
+            self._producer[out] = stage
+        self._stages[name] = stage
+        self.executed[name] = 0
+        self.skipped[name]  = 0
+        return stage
+
+    def begin(self, **inputs) -> FrameContext:
+        return FrameContext(self, inputs)
+
+    def end(self, ctx):
+        """フレーム終了。実行されなかったステージを skipped に数える。"""
+        for name in self._stages:
+            if name in ctx._ran: self.executed[name] += 1
+            else:                self.skipped[name]  += 1
+
+    def stats(self) -> dict:
+        """{stage名: (executed, skipped)}"""
+        return {n: (self.executed[n], self.skipped[n]) for n in self._stages}
@@ -0,0 +1,272 @@
+# stream_server.py — フレームごとのトラック・鼻位置・笑顔・倍率をローカルのソケットで配信する（Processing 版の入力用）
+#   python stream_server.py --camera 0
+#   python stream_server.py input.mp4 --realtime --shm
+#   python stream_server.py --synthetic 300 --port 8765
+# 描画はクライアント側。メッセージの形式は readme.md の「配信サーバー」を参照。
+import argparse
+import json
+import socket
+import struct
+import sys
+import threading
+import time
+from glob import glob
+
+import numpy as np
+
+from app_config import load_config
+from frame_processor import FrameProcessor, TRACK_DTYPE, track_table
+from frame_sources import camera_frames, open_source, synthetic_frames
+
+PROTOCOL_VERSION = 1
+MSG_HELLO = 1   # 本体は UTF-8 の JSON（接続直後に1回）
+MSG_FRAME = 2   # 本体はバイナリ（1フレームごと）
+
+# すべてビッグエンディアン（Java の DataInputStream でそのまま読める）
+HEADER       = struct.Struct(">IB")         # 長さ（型＋本体のバイト数）, 型
+FRAME_HEADER = struct.Struct(">IdiiHHH")    # seq, ts, shm_slot, assigned_id, w, h, 人数
+WIRE_DTYPE   = TRACK_DTYPE.newbyteorder(">")   # 1人32バイト
+
+
+def _message(kind, body):
+    return HEADER.pack(1 + len(body), kind) + body
+
+
+def encode_hello(shm_info=None):
+    """接続直後に送る説明（版・トラックのフィールド・共有メモリの場所）。"""
+    hello = {"version": PROTOCOL_VERSION, "fields": list(WIRE_DTYPE.names), "shm": None}
+    if shm_info is not None:
+        name, shape, slots = shm_info
+        hello["shm"] = {"name": name, "shape": list(shape), "slots": slots}
+    return _message(MSG_HELLO, json.dumps(hello).encode("utf-8"))
+
+
+def encode_frame(seq, res, frame_size, shm_slot=-1):
+    w, h = frame_size
+    recs = track_table(res).astype(WIRE_DTYPE)
+    assigned = res["assigned_id"]
+    head = FRAME_HEADER.pack(seq & 0xFFFFFFFF, res["ts"], shm_slot,
+                             -1 if assigned is None else assigned, w, h, len(recs))
+    return _message(MSG_FRAME, head + recs.tobytes())
+
+
+def decode_message(buf):
+    """
+    buf の先頭の1メッセージ -> ((型, 内容), 使ったバイト数)。足りなければ (None, 0)。
+    内容は HELLO なら dict、FRAME なら {"seq", "ts", "shm_slot", "assigned_id", "size", "tracks"}。
+    """
+    if len(buf) < HEADER.size:
+        return None, 0
+    length, kind = HEADER.unpack_from(buf)
+    end = 4 + length
+    if len(buf) < end:
+        return None, 0
+    body = bytes(buf[HEADER.size:end])
+    if kind == MSG_HELLO:
+        return (kind, json.loads(body.decode("utf-8"))), end
+    seq, ts, slot, assigned, w, h, n = FRAME_HEADER.unpack_from(body)
+    tracks = np.frombuffer(body, dtype=WIRE_DTYPE, count=n, offset=FRAME_HEADER.size)
+    return (kind, {"seq": seq, "ts": ts, "shm_slot": slot,
+                   "assigned_id": None if assigned < 0 else assigned,
+                   "size": (w, h), "tracks": tracks}), end
+
+
+class _Client:
+    def __init__(self, sock, addr):
+        self.sock    = sock
+        self.addr    = addr
+        self.pending = b""   # 送りきれなかったメッセージの残り
+        self.dropped = 0
+
+
+class StreamServer:
+    """
+    publish(payload) で接続中の全クライアントに送る（送信はノンブロッキングで、呼んだ側を待たせない）。
+      - 前のメッセージを送りきれていないクライアントには今のフレームを送らない
+        （遅いクライアントは古いフレームを溜めずに最新だけを受け取る。飛ばした数は dropped）。
+      - 切れた・エラーのクライアントは外す。
+      - 接続を受けるのは別スレッド。接続直後に hello を送る（ここだけ最大1秒待つ）。
+      - set_hello() で hello を差し替えると、接続中のクライアントにも送る（飛ばさずに必ず届ける）。
+    """
+    def __init__(self, host="127.0.0.1", port=8765, hello=b""):
+        self.hello     = hello
+        self._clients  = []
+        self._lock     = threading.Lock()
+        self._stop_ev  = threading.Event()
+        self._listen   = socket.create_server((host, port))
+        self._listen.settimeout(0.2)
+        self.address   = self._listen.getsockname()
+        self._thread   = threading.Thread(target=self._accept_loop, name="stream-accept", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def n_clients(self):
+        with self._lock:
+            return len(self._clients)
+
+    def _accept_loop(self):
+        while not self._stop_ev.is_set():
+            try:
+                sock, addr = self._listen.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            hello = self.hello
+            try:
+                sock.settimeout(1.0)
+                sock.sendall(hello)
+            except OSError:
+                sock.close()
+                continue
+            sock.setblocking(False)
+            client = _Client(sock, addr)
+            with self._lock:
+                if self.hello is not hello:
+                    client.pending = self.hello   # 送っている間に差し替わった
+                self._clients.append(client)
+            print(f"[stream] client connected: {addr[0]}:{addr[1]}")
+
+    def set_hello(self, hello):
+        """hello を差し替え、接続中のクライアントには送り残しの後ろに積んで送る。"""
+        with self._lock:
+            self.hello = hello
+            clients = list(self._clients)
+        for c in clients:
+            c.pending += hello
+
+    def _send(self, client, data):
+        """送れた分だけ送り、残りを pending に置く。切れていれば False。"""
+        try:
+            sent = client.sock.send(data) if data else 0
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            return False
+        client.pending = data[sent:]
+        return True
+
+    def publish(self, payload):
+        with self._lock:
+            clients = list(self._clients)
+        gone = []
+        for c in clients:
+            if c.pending:
+                if not self._send(c, c.pending):
+                    gone.append(c)
+                elif c.pending:
+                    c.dropped += 1
+                continue
+            if not self._send(c, payload):
+                gone.append(c)
+        for c in gone:
+            self._drop(c)
+
+    def _drop(self, client):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+        try:
+            client.sock.close()
+        except OSError:
+            pass
+        print(f"[stream] client disconnected: {client.addr[0]}:{client.addr[1]} (dropped {client.dropped})")
+
+    def close(self):
+        self._stop_ev.set()
+        self._listen.close()
+        self._thread.join(timeout=1.0)
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for c in clients:
+            try:
+                c.sock.close()
+            except OSError:
+                pass
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Nose Mirror local stream server")
+    ap.add_argument("input", nargs="?", help="動画ファイル or 連番画像ディレクトリ")
+    ap.add_argument("--camera", type=int, metavar="INDEX", help="入力の代わりにカメラを使う")
+    ap.add_argument("--synthetic", type=int, metavar="N", help="入力の代わりに合成フレームを N 枚使う")
+    ap.add_argument("--fps", type=float, default=None, help="タイムスタンプ用の fps（省略時は動画の値/30）")
+    ap.add_argument("--realtime", action="store_true", help="録画・合成をタイムスタンプどおりの速さで流す")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--shm", action="store_true", help="フレーム画像も共有メモリのリングに置く")
+    ap.add_argument("--shm-slots", type=int, default=4)
+    ap.add_argument("--workers", action="store_true", help="モデルを別プロセスで回す（multiprocess と同じ）")
+    ap.add_argument("--seed", type=int, default=None, help="割当の乱数シード")
+    args = ap.parse_args(argv)
+
+    if args.camera is not None:
+        frames = camera_frames(args.camera)
+    elif args.synthetic:
+        frames = synthetic_frames(args.synthetic, args.fps or 30.0)
+    elif args.input:
+        frames = open_source(args.input, args.fps)
+    else:
+        ap.error("input / --camera / --synthetic のどれかを指定してください")
+
+    cfg = load_config()
+    workers = None
+    if args.workers:
+        from model_workers import ModelWorkerPool
+        workers = ModelWorkerPool(cfg, slots=int(cfg.get("mp_ring_slots", 4)),
+                                  timeout=float(cfg.get("mp_result_timeout", 0.5)))
+    processor = FrameProcessor(cfg, n_images=max(1, len(glob("assets/nose_*.png"))),
+                               seed=args.seed, remote=workers)
+    processor.debug_overlay = False
+
+    ring = server = None
+    seq = 0
+    t0 = time.perf_counter(); first_ts = None
+    try:
+        for ts, frame in frames:
+            if server is None:
+                # 共有メモリはフレームの大きさが分かってから作る（hello で場所を知らせる）
+                if args.shm:
+                    from model_workers import SharedFrameRing
+                    ring = SharedFrameRing(frame.shape, args.shm_slots)
+                server = StreamServer(args.host, args.port,
+                                      encode_hello(ring.info if ring else None)).start()
+                print(f"[stream] listening on {server.address[0]}:{server.address[1]}"
+                      + (f" (shm {ring.info[0]})" if ring else ""))
+                processor.warm_up(frame.shape[1::-1])
+            elif ring is not None and frame.shape != ring.shape:
+                # 解像度が変わった（カメラ切り替え）。リングを作り直し、hello で新しい場所を知らせる
+                old, ring = ring, SharedFrameRing(frame.shape, args.shm_slots)
+                server.set_hello(encode_hello(ring.info))
+                old.close(unlink=True)
+                print(f"[stream] frame size changed to {frame.shape[1]}x{frame.shape[0]} (shm {ring.info[0]})")
+            if args.realtime and args.camera is None:
+                first_ts = ts if first_ts is None else first_ts
+                wait = (ts - first_ts) - (time.perf_counter() - t0)
+                if wait > 0:
+                    time.sleep(wait)
+
+            res = processor.process(frame, ts)
+            slot = ring.write(seq, frame) if ring is not None else -1
+            h, w = frame.shape[:2]
+            server.publish(encode_frame(seq, res, (w, h), slot))
+            seq += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.close()
+        if ring is not None:
+            ring.close(unlink=True)
+        if workers is not None:
+            workers.close()
+    dt = time.perf_counter() - t0
+    print(f"{seq} frames in {dt:.1f}s ({seq / dt if dt else 0:.1f} fps)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
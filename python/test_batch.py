@@ -0,0 +1,81 @@
+# test_batch.py — 1つの FrameProcessor で録画を続けて処理しても、前のファイルの状態が結果に混ざらないこと
+#   python -m pytest -q test_batch.py
+# MediaPipe は「前の呼び出しを引き継ぐ」差し替え（reset() するまで検出位置が呼ぶたびにずれる）にする。
+import sys
+from types import ModuleType, SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from app_config import DEFAULT_CONFIG
+from batch import process_file
+from frame_processor import FrameProcessor, create_hog_fallback
+
+
+class _TrackingModel:
+    """static_image_mode=False のように呼び出しをまたいで状態を持つ。"""
+    def __init__(self, *args, **kwargs):
+        self.calls = 0
+
+    def reset(self):
+        self.calls = 0
+
+    def process(self, rgb):
+        self.calls += 1
+        box = SimpleNamespace(xmin=0.1 + 0.01 * self.calls, ymin=0.2, width=0.25, height=0.35)
+        det = SimpleNamespace(location_data=SimpleNamespace(relative_bounding_box=box))
+        return SimpleNamespace(detections=[det], multi_face_landmarks=[], pose_landmarks=None)
+
+
+@pytest.fixture
+def fake_mediapipe(monkeypatch):
+    mp = ModuleType("mediapipe")
+    mp.solutions = SimpleNamespace(face_mesh=SimpleNamespace(FaceMesh=_TrackingModel),
+                                   face_detection=SimpleNamespace(FaceDetection=_TrackingModel),
+                                   pose=SimpleNamespace(Pose=_TrackingModel))
+    monkeypatch.setitem(sys.modules, "mediapipe", mp)
+
+
+def _write_video(path, n, level):
+    w = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 30.0, (320, 240))
+    assert w.isOpened()
+    for i in range(n):
+        w.write(np.full((240, 320, 3), level + i, dtype=np.uint8))
+    w.release()
+    return str(path)
+
+
+def _processor():
+    proc = FrameProcessor(dict(DEFAULT_CONFIG), n_images=3)
+    proc.debug_overlay = False
+    return proc
+
+
+def test_file_result_does_not_depend_on_previous_file(fake_mediapipe, tmp_path):
+    a = _write_video(tmp_path / "a.avi", 20, 40)
+    b = _write_video(tmp_path / "b.avi", 20, 120)
+    (tmp_path / "seq").mkdir(); (tmp_path / "alone").mkdir()
+
+    proc = _processor()
+    assert "error" not in process_file(a, str(tmp_path / "seq"), processor=proc)
+    assert "error" not in process_file(b, str(tmp_path / "seq"), processor=proc)
+    assert "error" not in process_file(b, str(tmp_path / "alone"), processor=_processor())
+
+    seq = np.load(tmp_path / "seq" / "b.npz")
+    alone = np.load(tmp_path / "alone" / "b.npz")
+    assert len(alone["id"]) > 0
+    for key in ("ts", "assigned_id", "offsets", "id", "cx", "cy", "nose_x", "nose_y",
+                "base_size", "smile", "scale"):
+        np.testing.assert_array_equal(seq[key], alone[key], err_msg=key)
+
+
+def test_hog_reset_drops_reused_result():
+    hog = create_hog_fallback(DEFAULT_CONFIG)
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    hog.detect(frame)
+    hog.detect(frame)
+    assert (hog.runs, hog.reused) == (1, 1)   # 動きが無いので前回結果を使う
+    hog.reset()
+    hog.detect(frame)
+    assert (hog.runs, hog.reused) == (2, 1)   # reset 後は回し直す
@@ -0,0 +1,22 @@
+# test_metrics.py — StageMetrics の計測オフ時に何も溜めないこと
+#   python -m pytest -q test_metrics.py
+from metrics import StageMetrics
+
+
+def test_disabled_record_keeps_nothing():
+    m = StageMetrics(enabled=False)
+    for i in range(10):
+        m.record("camera_first_frame", 1000 + i)
+        with m.stage("face_mesh"):
+            pass
+    assert m.summary() == {}
+    assert m._rings == {}
+
+
+def test_enabled_record_summarizes():
+    m = StageMetrics(window=4)
+    for ns in (1_000_000, 2_000_000, 3_000_000, 4_000_000, 5_000_000):
+        m.record("frame", ns)
+    s = m.summary()["frame"]
+    assert s["count"] == 5
+    assert s["p50_ms"] == 3.5   # 直近 window 件（2〜5 ms）だけを見る
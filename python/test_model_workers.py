@@ -0,0 +1,87 @@
+# test_model_workers.py — ModelWorkerPool がワーカーを kill されても止まらずに戻ること
+#   python -m pytest -q test_model_workers.py
+# MediaPipe は何も検出しない差し替え（spawn の子プロセスも親の sys.path を使うのでそちらが読まれる）。
+import os
+import signal
+import sys
+import textwrap
+import time
+
+import numpy as np
+import pytest
+
+from model_workers import ModelWorkerPool
+
+FAKE_MEDIAPIPE = """
+from types import SimpleNamespace
+
+class _Model:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def reset(self):
+        pass
+
+    def process(self, rgb):
+        return SimpleNamespace(multi_face_landmarks=[], detections=None, pose_landmarks=None)
+
+solutions = SimpleNamespace(face_mesh=SimpleNamespace(FaceMesh=_Model),
+                            face_detection=SimpleNamespace(FaceDetection=_Model),
+                            pose=SimpleNamespace(Pose=_Model))
+"""
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    pkg = tmp_path / "mediapipe"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text(textwrap.dedent(FAKE_MEDIAPIPE), encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    p = ModelWorkerPool({"max_faces": 2}, timeout=0.5)
+    p.start((120, 160, 3))
+    yield p
+    p.close()
+
+
+def _run(pool, n, keyframe=True):
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    out = None
+    for _ in range(n):
+        out = pool.run(frame, (160, 120), keyframe)
+    return out
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="SIGKILL が無い")
+def test_pool_recovers_after_worker_killed(pool):
+    assert pool.wait_ready(timeout=30.0)
+    _run(pool, 3)
+    assert pool.timeouts == 0
+
+    victim = pool._workers["face_mesh"]
+    old_pid = victim.proc.pid
+    os.kill(old_pid, signal.SIGKILL)
+    victim.proc.join(timeout=5.0)
+
+    # 落ちたワーカーを待たずに返り、他のワーカーの結果は届き続ける
+    t0 = time.monotonic()
+    out = _run(pool, 1)
+    assert time.monotonic() - t0 < pool.timeout
+    assert out["face_mesh"].shape[0] == 0
+    assert out["face_boxes"] == []
+
+    # 作り直されたワーカーが準備できたら、また全部の結果が揃う
+    deadline = time.monotonic() + 30.0
+    while not (victim.ready and victim.proc.pid != old_pid):
+        assert time.monotonic() < deadline, "face_mesh worker was not restarted"
+        _run(pool, 1)
+        time.sleep(0.05)
+    timeouts = pool.timeouts
+    t0 = time.monotonic()
+    _run(pool, 5)
+    assert pool.timeouts == timeouts
+    assert time.monotonic() - t0 < 5 * pool.timeout
+
+    # reset（別の映像に切り替え）の後も結果は揃う
+    pool.reset()
+    _run(pool, 3)
+    assert pool.timeouts == timeouts
@@ -0,0 +1,80 @@
+# test_nose_logic.py — VectorNoseLogic が NoseLogic と全フレーム一致すること、人が出入りしても他の人の状態が変わらないこと
+#   python -m pytest -q test_nose_logic.py
+import pytest
+
+from bench_nose_logic import record_sequence
+from nose_logic import S_EMA_ALPHA, NoseLogic, VectorNoseLogic
+
+
+class _Clock:
+    def __init__(self): self.t = 0.0
+    def __call__(self): return self.t
+
+
+def _smile(pid, i):
+    # 3秒ごとに笑う/戻るを繰り返す（人ごとに位相をずらす）
+    return 0.7 if (i // 90 + pid) % 2 else 0.1
+
+
+def _step(logic, clock, ids, i):
+    clock.t += 1 / 30
+    return logic.update({pid: None for pid in ids}, {pid: _smile(pid, i) for pid in ids})
+
+
+def _make(cls, clock, legacy_reset):
+    if cls is VectorNoseLogic:
+        return cls(legacy_reset=legacy_reset, capacity=2, clock=clock)   # 3人目でスロットを増やす
+    return cls(legacy_reset=legacy_reset, clock=clock)
+
+
+@pytest.mark.parametrize("legacy_reset", [False, True])
+@pytest.mark.parametrize("seed", range(5))
+def test_vector_matches_dict_on_recorded_sequences(seed, legacy_reset):
+    # 人が出入りし、笑う/戻るを繰り返す記録済みの列（bench_nose_logic と同じもの）
+    clocks = _Clock(), _Clock()
+    ref = NoseLogic(legacy_reset=legacy_reset, clock=clocks[0])
+    vec = VectorNoseLogic(legacy_reset=legacy_reset, clock=clocks[1])
+    for i, (dt, smiles) in enumerate(record_sequence(3000, 6, seed)):
+        for c in clocks:
+            c.t += dt
+        marks = {pid: None for pid in smiles}
+        a = ref.update(marks, smiles)
+        b = vec.update(marks, smiles)
+        assert list(b.items()) == list(a.items()), f"frame {i}"
+        assert vec.ids_live == ref.ids_live, f"frame {i}"
+        for pid in ref.ids_live:
+            assert vec.export_person(pid) == ref.export_person(pid), f"frame {i} id {pid}"
+
+
+@pytest.mark.parametrize("cls", [NoseLogic, VectorNoseLogic])
+@pytest.mark.parametrize("change", ["join", "leave"])
+def test_changed_reset_keeps_others(cls, change):
+    stay = (1, 2)
+    other = 3
+    clocks = _Clock(), _Clock()
+    ref, logic = (_make(cls, c, False) for c in clocks)
+    before = stay + (other,) if change == "leave" else stay
+    after = stay if change == "leave" else stay + (other,)
+    for i in range(300):
+        _step(ref, clocks[0], stay, i)
+        _step(logic, clocks[1], before, i)
+    # 出入りの前後で、残った人の倍率と状態は出入りの無かった方と一致する（スロット追加の再確保も含む）
+    for i in range(300, 600):
+        a = _step(ref, clocks[0], stay, i)
+        b = _step(logic, clocks[1], after, i)
+        assert {pid: b[pid] for pid in stay} == a
+    for pid in stay:
+        assert logic.export_person(pid) == ref.export_person(pid)
+
+
+@pytest.mark.parametrize("cls", [NoseLogic, VectorNoseLogic])
+def test_legacy_reset_clears_everyone(cls):
+    clock = _Clock()
+    logic = _make(cls, clock, True)
+    for i in range(300):
+        _step(logic, clock, (1, 2), i)
+    _step(logic, clock, (1, 2, 3), 300)
+    # 初期化された直後の1フレーム分だけ学習した状態になる
+    st = logic.export_person(1)
+    assert st["smile_ema"] == pytest.approx(S_EMA_ALPHA * _smile(1, 300))
+    assert not st["is_on"] and st["on_frames"] == 0
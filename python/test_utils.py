@@ -0,0 +1,50 @@
+# test_utils.py — overlay_image_premul（整数版）が overlay_image_alpha（float 参照実装）と各チャンネル誤差1以内で一致すること
+#   python -m pytest -q test_utils.py
+import numpy as np
+import pytest
+
+from utils import overlay_image_alpha, overlay_image_premul, premultiply_sprite
+
+FRAME_W, FRAME_H = 320, 240
+
+
+def _sprite(size, rng):
+    bgr = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    alpha = rng.integers(0, 256, (size, size), dtype=np.uint8)
+    alpha[: size // 4] = 0      # 完全に透明
+    alpha[-size // 4:] = 255    # 完全に不透明
+    return bgr, alpha
+
+
+@pytest.mark.parametrize("size", [8, 33, 96, 200])
+@pytest.mark.parametrize("where", ["inside", "clip_tl", "clip_br", "outside"])
+def test_premul_matches_float_reference(size, where):
+    rng = np.random.default_rng(size)
+    bgr, alpha = _sprite(size, rng)
+    premul, inv = premultiply_sprite(bgr, alpha)
+    pos = {"inside":  (FRAME_W // 2 - size // 2, FRAME_H // 2 - size // 2),
+           "clip_tl": (-size // 3, -size // 2),
+           "clip_br": (FRAME_W - size // 2, FRAME_H - size // 3),
+           "outside": (FRAME_W + 5, FRAME_H + 5)}[where]
+    frame = rng.integers(0, 256, (FRAME_H, FRAME_W, 3), dtype=np.uint8)
+    ref, out = frame.copy(), frame.copy()
+    overlay_image_alpha(ref, bgr, pos, alpha / 255.0)
+    overlay_image_premul(out, premul, inv, pos)
+    assert int(np.abs(ref.astype(np.int16) - out).max()) <= 1
+
+
+def test_premul_all_alpha_and_color_pairs():
+    # 前景・背景・アルファの全組み合わせの端（0/255）と中間を網羅する
+    vals = np.arange(0, 256, 5, dtype=np.uint8)
+    fg, bg, a = np.meshgrid(vals, vals, np.arange(256, dtype=np.uint8), indexing="ij")
+    n = fg.size
+    side = int(np.ceil(np.sqrt(n)))
+    pad = side * side - n
+    sprite = np.repeat(np.pad(fg.ravel(), (0, pad)).reshape(side, side, 1), 3, axis=2)
+    alpha = np.pad(a.ravel(), (0, pad)).reshape(side, side)
+    frame = np.repeat(np.pad(bg.ravel(), (0, pad)).reshape(side, side, 1), 3, axis=2)
+    premul, inv = premultiply_sprite(sprite, alpha)
+    ref, out = frame.copy(), frame.copy()
+    overlay_image_alpha(ref, sprite, (0, 0), alpha / 255.0)
+    overlay_image_premul(out, premul, inv, (0, 0))
+    assert int(np.abs(ref.astype(np.int16) - out).max()) <= 1
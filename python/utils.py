@@ -8,8 +8,10 @@ def overlay_image_alpha(img, img_overlay, pos, alpha_mask):
     img: BGR 8bit 背景フレーム (numpy array)
     img_overlay: BGR 8bit オーバーレイする鼻画像 (アルファ抜き)
     pos: (x, y) のタプル。 背景上の左上に配置する座標
-    alpha_mask: float マスク (0.0～1.0) 同じサイズの行列
+    alpha_mask: float マスク (0.0～1.0) 同じサイズの行列（uint8 なら 0～255 とみなす）
     """
+    if alpha_mask.dtype == np.uint8:
+        alpha_mask = alpha_mask * (1.0 / 255.0)
     x, y = pos
     h, w = img_overlay.shape[:2]
 
@@ -45,3 +47,64 @@ def overlay_image_alpha(img, img_overlay, pos, alpha_mask):
         roi = img[y:y+h, x:x+w]
         inv_mask = 1.0 - alpha_mask[..., None]
         img[y:y+h, x:x+w] = (img_overlay * alpha_mask[..., None] + roi * inv_mask).astype("uint8")
+
+
+def premultiply_sprite(img_overlay, alpha_mask):
+    """
+    overlay_image_premul 用のスプライトを作る。
+    img_overlay: BGR uint8, alpha_mask: uint8 (0～255)
+    return: (premul, inv_alpha)
+      premul   : round(BGR * a / 255) の uint8 (h, w, 3)
+      inv_alpha: 255 - a の uint8 (h, w, 1)
+    """
+    a = alpha_mask.astype(np.uint16)[..., None]
+    premul = (img_overlay.astype(np.uint16) * a + 127) // 255
+    return premul.astype(np.uint8), (255 - alpha_mask)[..., None].copy()
+
+
+class BlendScratch:
+    """overlay_image_premul の作業用 uint16 バッファ。必要な大きさまで伸ばして使い回す。"""
+    def __init__(self):
+        self._a = np.empty(0, dtype=np.uint16)
+        self._b = np.empty(0, dtype=np.uint16)
+
+    def get(self, h, w):
+        n = h * w * 3
+        if self._a.size < n:
+            self._a = np.empty(n, dtype=np.uint16)
+            self._b = np.empty(n, dtype=np.uint16)
+        return self._a[:n].reshape(h, w, 3), self._b[:n].reshape(h, w, 3)
+
+_default_scratch = BlendScratch()
+
+
+def overlay_image_premul(img, premul, inv_alpha, pos, scratch=None):
+    """
+    overlay_image_alpha の整数版（結果の差は各チャンネル最大1）。
+      out = premul + round(roi * (255 - a) / 255)
+    を uint16 固定小数点で計算し、img のスライスへ直接書き込む。
+    作業バッファは scratch（省略時はモジュール共通）を使い回すので毎回の確保は無い。
+    描画スレッド以外から同時に呼ぶ場合は呼び出し側ごとに BlendScratch を渡すこと。
+    """
+    x, y = pos
+    h, w = premul.shape[:2]
+    x1 = max(x, 0); y1 = max(y, 0)
+    x2 = min(x + w, img.shape[1]); y2 = min(y + h, img.shape[0])
+    if x1 >= x2 or y1 >= y2:
+        return
+    ex1 = x1 - x; ey1 = y1 - y
+    ch, cw = y2 - y1, x2 - x1
+
+    roi = img[y1:y2, x1:x2]
+    p   = premul[ey1:ey1+ch, ex1:ex1+cw]
+    ia  = inv_alpha[ey1:ey1+ch, ex1:ex1+cw]
+    t, u = (scratch or _default_scratch).get(ch, cw)
+
+    # t = roi * (255-a) を 255 で割って丸める: (t + 128 + ((t + 128) >> 8)) >> 8
+    np.multiply(roi, ia, out=t, dtype=np.uint16)
+    t += 128
+    np.right_shift(t, 8, out=u)
+    t += u
+    t >>= 8
+    np.add(t, p, out=t)
+    roi[...] = t